@@ -1,37 +1,79 @@
 # ABOUTME: Pytest configuration and shared fixtures for voxkey integration tests.
 # ABOUTME: Provides mock portal, D-Bus connections, virtual mic, and daemon lifecycle.
 
-import asyncio
+import functools
 import os
-import select
+import shutil
 import subprocess
+import tempfile
 import signal
-import time
 
 import pytest
 import pytest_asyncio
-from dbus_next.aio import MessageBus
-
-from helpers.dbus_portal import (
-    get_portal_proxy,
-    has_interface,
-    safe_introspect,
-    GLOBAL_SHORTCUTS_IFACE,
-    REMOTE_DESKTOP_IFACE,
-    PORTAL_BUS_NAME,
-    PORTAL_OBJECT_PATH,
+
+from helpers.daemon_io import (
+    collect_stderr,
+    start_stderr_reader,
+    wait_for_daemon_idle,
 )
-from helpers.mock_portal import start_mock_portal
-from helpers.virtual_microphone import VirtualMicrophone
+
+# Heavy imports (dbus_fast, the mock portal service, the virtual mic) are
+# deferred into the fixtures that need them so collection-only runs and
+# non-integration invocations don't pay for them at conftest import.
 
 
 # ---------------------------------------------------------------------------
 # Environment detection
 # ---------------------------------------------------------------------------
 
+@functools.lru_cache(maxsize=1)
 def _daemon_binary():
-    """Path to the voxkey daemon binary. Override with VOXKEY_BIN env var."""
-    return os.environ.get("VOXKEY_BIN", "voxkey")
+    """Path to the voxkey daemon binary. Override with VOXKEY_BIN env var.
+
+    Resolved to an absolute path once via PATH lookup so every spawn can
+    execv directly instead of re-walking PATH.
+    """
+    name = os.environ.get("VOXKEY_BIN", "voxkey")
+    return shutil.which(name) or name
+
+
+# Snapshot of the environment taken once at import, so daemon spawns only
+# pay for the small per-spawn overlay instead of copying os.environ each time.
+_BASE_ENV = dict(os.environ)
+
+
+# ---------------------------------------------------------------------------
+# Fixtures: environment isolation
+# ---------------------------------------------------------------------------
+
+@pytest.fixture(scope="session", autouse=True)
+def tmpfs_config_home():
+    """Point XDG_CONFIG_HOME at a tmpfs-backed directory for the session.
+
+    The daemon writes its restore token under $XDG_CONFIG_HOME/voxkey on
+    every grant and the persistence tests rewrite that file around each
+    test; backing it with /dev/shm keeps the token I/O in RAM instead of
+    the filesystem journal, and isolates the user's real config from the
+    run. Falls back to the normal temp dir when /dev/shm is absent.
+    """
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    # mkdtemp is already unique per process, but naming the xdist worker
+    # makes each worker's config root identifiable when debugging runs.
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+    tmp = tempfile.mkdtemp(prefix=f"voxkey-test-{worker}-", dir=base)
+    previous = os.environ.get("XDG_CONFIG_HOME")
+    os.environ["XDG_CONFIG_HOME"] = tmp
+    # _BASE_ENV was snapshotted at import; daemon spawns overlay it, so
+    # it must see the redirect too.
+    _BASE_ENV["XDG_CONFIG_HOME"] = tmp
+    yield tmp
+    if previous is None:
+        os.environ.pop("XDG_CONFIG_HOME", None)
+        _BASE_ENV.pop("XDG_CONFIG_HOME", None)
+    else:
+        os.environ["XDG_CONFIG_HOME"] = previous
+        _BASE_ENV["XDG_CONFIG_HOME"] = previous
+    shutil.rmtree(tmp, ignore_errors=True)
 
 
 # ---------------------------------------------------------------------------
@@ -44,7 +86,13 @@ def mock_portal():
 
     Returns (bus_address, controller, stop_fn). The bus_address is used by
     daemon_process and dbus_session to connect to the isolated bus.
+
+    Safe under pytest-xdist: each worker process gets its own session
+    scope, and dbus-daemon --print-address allocates a unique socket per
+    invocation, so workers boot their buses in parallel without sharing.
     """
+    from helpers.mock_portal import start_mock_portal
+
     bus_address, controller, stop = start_mock_portal()
     yield bus_address, controller, stop
     stop()
@@ -62,30 +110,46 @@ def portal_control(mock_portal):
 # Fixtures: D-Bus (connected to mock portal)
 # ---------------------------------------------------------------------------
 
-@pytest_asyncio.fixture
+@pytest_asyncio.fixture(scope="session")
 async def dbus_session(mock_portal):
-    """Provide a D-Bus connection to the mock portal bus."""
+    """Provide a D-Bus connection to the mock portal bus.
+
+    Session-scoped (with the session event loop configured in pytest.ini)
+    so all tests share one connection instead of paying a connect/auth
+    handshake each.
+    """
+    from dbus_fast.aio import MessageBus
+
     bus_address, _, _ = mock_portal
     bus = await MessageBus(bus_address=bus_address).connect()
     yield bus
     bus.disconnect()
 
 
-@pytest_asyncio.fixture
+@pytest_asyncio.fixture(scope="session")
 async def portal_proxy(dbus_session):
     """Provide a proxy to the mock XDG Desktop Portal."""
-    introspection = await safe_introspect(
-        dbus_session, PORTAL_BUS_NAME, PORTAL_OBJECT_PATH,
-    )
-    return dbus_session.get_proxy_object(
-        PORTAL_BUS_NAME, PORTAL_OBJECT_PATH, introspection,
-    )
+    from helpers.dbus_portal import get_portal_proxy
+
+    return await get_portal_proxy(dbus_session)
 
 
 # ---------------------------------------------------------------------------
 # Fixtures: virtual devices
 # ---------------------------------------------------------------------------
 
+def pytest_collection_modifyitems(session, config, items):
+    """Record whether any selected test actually needs the virtual mic.
+
+    Lets daemon fixtures skip null-sink setup entirely on D-Bus-only runs
+    (e.g. -k capabilities) while still creating the mic before the daemon
+    spawns whenever an audio test is in the selection.
+    """
+    session._needs_audio = any(
+        "virtual_mic" in item.fixturenames for item in items
+    )
+
+
 @pytest.fixture(scope="session")
 def virtual_mic():
     """Provide a virtual microphone routed as the default audio source.
@@ -93,7 +157,12 @@ def virtual_mic():
     Session-scoped so it's created before any function-scoped daemon_process,
     ensuring cpal picks up the virtual source instead of the real microphone.
     """
-    mic = VirtualMicrophone()
+    from helpers.virtual_microphone import VirtualMicrophone
+
+    # Per-worker sink name under pytest-xdist: workers share one PipeWire
+    # instance, so a fixed name would make them unload each other's sinks.
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+    mic = VirtualMicrophone(sink_name=f"voxkey_test_mic_{worker}")
     yield mic
     mic.close()
 
@@ -102,61 +171,48 @@ def virtual_mic():
 # Fixtures: daemon lifecycle
 # ---------------------------------------------------------------------------
 
-def _wait_for_daemon_idle(proc, timeout=15):
-    """Poll daemon stderr for 'STATE: Idle', collecting all startup lines.
+def _spawn_daemon(bus_address):
+    """Spawn the daemon against the given bus and wait for Idle.
 
-    Returns (reached_idle, startup_lines).
+    Fails the requesting test's setup if Idle never arrives, so individual
+    tests don't need a defensive reached_idle assertion; proc.reached_idle
+    and proc.startup_lines stay set for tests that inspect startup.
+    Once Idle is reached, a background thread keeps draining stderr
+    into proc.log_queue — without it a chatty daemon fills the 64K pipe
+    buffer mid-test and blocks on its next log write. Tests read daemon
+    log lines from proc.log_queue, never from proc.stderr directly.
     """
-    lines = []
-    deadline = time.monotonic() + timeout
-    reached_idle = False
-
-    while time.monotonic() < deadline:
-        if proc.poll() is not None:
-            break
-        ready = select.select([proc.stderr], [], [], 0.5)[0]
-        if ready:
-            line = proc.stderr.readline()
-            if line:
-                decoded = line.decode("utf-8", errors="replace").strip()
-                lines.append(decoded)
-                if "STATE:" in decoded and "Idle" in decoded.split("STATE:")[-1]:
-                    reached_idle = True
-                    break
-
-    return reached_idle, lines
-
-
-@pytest.fixture
-def daemon_process(mock_portal, virtual_mic):
-    """Start and stop the voxkey daemon against the mock portal.
-
-    The daemon runs on the isolated bus so it never touches the real
-    desktop session. The virtual_mic dependency ensures audio routing
-    is ready before the daemon starts.
-
-    proc.reached_idle and proc.startup_lines are set for tests that need them.
-    """
-    bus_address, _, _ = mock_portal
-    binary = _daemon_binary()
-
-    env = os.environ.copy()
-    env["DBUS_SESSION_BUS_ADDRESS"] = bus_address
+    env = _BASE_ENV | {"DBUS_SESSION_BUS_ADDRESS": bus_address}
 
+    # close_fds=False keeps subprocess on the posix_spawn fast path (it
+    # falls back to fork+exec otherwise, cloning the parent's page tables).
+    # Safe since PEP 446 made Python-created fds non-inheritable; combined
+    # with the absolute binary path from _daemon_binary, spawns skip both
+    # the fork and the PATH walk.
     proc = subprocess.Popen(
-        [binary],
+        [_daemon_binary()],
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         env=env,
+        close_fds=False,
     )
 
-    reached_idle, startup_lines = _wait_for_daemon_idle(proc)
+    reached_idle, startup_lines, leftover, tail = wait_for_daemon_idle(proc)
+    if not reached_idle:
+        _stop_daemon(proc)
+        pytest.fail(
+            "Daemon did not reach Idle during startup — mock portal setup "
+            "incomplete. Startup stderr:\n" + "\n".join(startup_lines)
+        )
     proc.reached_idle = reached_idle
     proc.startup_lines = startup_lines
     proc.bus_address = bus_address
+    start_stderr_reader(proc, leftover, tail)
+    return proc
 
-    yield proc
 
+def _stop_daemon(proc):
+    """Terminate a daemon process, escalating to SIGKILL if needed."""
     if proc.poll() is None:
         proc.send_signal(signal.SIGTERM)
         try:
@@ -166,7 +222,84 @@ def daemon_process(mock_portal, virtual_mic):
             proc.wait()
 
 
+def _ensure_mic_if_needed(request):
+    """Create the session virtual mic before a daemon spawn, if audio is used.
+
+    The mic must exist before any daemon starts so cpal picks the virtual
+    source, but D-Bus-only selections shouldn't pay for null-sink setup;
+    the flag recorded at collection time decides.
+    """
+    if getattr(request.session, "_needs_audio", True):
+        request.getfixturevalue("virtual_mic")
+
+
+@pytest.fixture(autouse=True)
+def _drain_daemon_log(request):
+    """Start each test on the shared daemon with an empty log queue.
+
+    The session daemon's queue carries over whatever earlier tests left
+    unread — trailing Idle transitions, late injection logs — and many
+    tests enqueue without ever reading. A stale backlog lets
+    wait_for_state satisfy itself on lines from a previous test, so
+    drain before every test that uses the shared daemon. Guarded on the
+    test's fixture list so D-Bus-only tests don't spawn the daemon just
+    to drain it.
+    """
+    if "daemon_process" in request.fixturenames:
+        collect_stderr(request.getfixturevalue("daemon_process"), timeout=0.05)
+
+
+@pytest.fixture(scope="session")
+def daemon_process(request, mock_portal):
+    """One voxkey daemon shared by the whole session.
+
+    The daemon runs on the isolated bus so it never touches the real
+    desktop session, and returns to Idle between dictation cycles, so
+    per-test isolation only needs portal_control.clear_keysym_log()
+    (already done by the portal_control fixture). Tests that kill or
+    crash the daemon must use fresh_daemon_process instead.
+    """
+    _ensure_mic_if_needed(request)
+    bus_address, _, _ = mock_portal
+    proc = _spawn_daemon(bus_address)
+    yield proc
+    _stop_daemon(proc)
+
+
+@pytest.fixture
+def fresh_daemon_process(request, mock_portal):
+    """A private daemon for tests that terminate or corrupt the process."""
+    _ensure_mic_if_needed(request)
+    bus_address, _, _ = mock_portal
+    proc = _spawn_daemon(bus_address)
+    yield proc
+    _stop_daemon(proc)
+
+
 @pytest.fixture
 def fixtures_dir():
     """Path to the test fixtures directory."""
     return os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+@pytest.fixture(scope="session")
+def wav_cache():
+    """Decoded PCM for the audio fixtures streamed repeatedly by tests.
+
+    Maps filename -> (rate, channels, sampwidth, frames), read and parsed
+    once per session so each dictation cycle streams from memory via
+    virtual_mic.stream_pcm instead of re-opening the file.
+    """
+    import wave
+
+    fixtures = os.path.join(os.path.dirname(__file__), "fixtures")
+    cache = {}
+    for name in ("hello_world.wav", "the_quick_brown_fox.wav", "test_utterance.wav"):
+        with wave.open(os.path.join(fixtures, name)) as w:
+            cache[name] = (
+                w.getframerate(),
+                w.getnchannels(),
+                w.getsampwidth(),
+                w.readframes(w.getnframes()),
+            )
+    return cache
@@ -0,0 +1,208 @@
+# ABOUTME: Shared helpers for reading daemon stderr and pacing on 'STATE:' lines.
+# ABOUTME: Owns the startup Idle scan, the reader thread, and event-driven waits.
+
+import os
+import queue
+import re
+import selectors
+import subprocess
+import threading
+import time
+
+import pytest
+
+
+# Matches a 'STATE: ... Idle' transition on a raw stderr line, so the hot
+# startup loop can test bytes directly without decoding or splitting first.
+_IDLE_RE = re.compile(rb"STATE:[^\r\n]*Idle")
+
+
+def wait_for_daemon_idle(proc, timeout=15):
+    """Wait on daemon stderr for 'STATE: Idle', collecting all startup lines.
+
+    Event-driven: the pipe is switched to non-blocking and drained in bulk
+    with os.read between selector waits, so Idle is detected the moment it
+    is logged with one syscall pair per burst of output rather than per
+    line. EOF on stderr means the daemon exited, which also ends the wait.
+
+    Returns (reached_idle, startup_lines, leftover_lines, tail): raw
+    lines read in the same burst after the Idle line, and the partial
+    unterminated tail, have already been consumed from the pipe — pass
+    them to start_stderr_reader so they aren't lost.
+    """
+    fd = proc.stderr.fileno()
+    os.set_blocking(fd, False)
+    sel = selectors.DefaultSelector()
+    sel.register(proc.stderr, selectors.EVENT_READ)
+
+    lines = []
+    leftover = []
+    buf = b""
+    deadline = time.monotonic() + timeout
+    reached_idle = False
+
+    try:
+        while not reached_idle:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or proc.poll() is not None:
+                break
+            if not sel.select(remaining):
+                break  # deadline passed with no further output
+            try:
+                chunk = os.read(fd, 65536)
+            except BlockingIOError:
+                continue
+            if not chunk:
+                break  # EOF: daemon exited
+            buf += chunk
+            *complete, buf = buf.split(b"\n")
+            for i, line in enumerate(complete):
+                lines.append(line.decode("utf-8", errors="replace").strip())
+                if _IDLE_RE.search(line):
+                    reached_idle = True
+                    leftover = complete[i + 1:]
+                    break
+    finally:
+        sel.close()
+        os.set_blocking(fd, True)
+
+    return reached_idle, lines, leftover, buf
+
+
+def start_stderr_reader(proc, leftover=(), tail=b""):
+    """Attach proc.log_queue and start the stderr reader thread.
+
+    One reader thread per daemon: it captures lines as they are emitted
+    (no were-we-polling-at-the-right-instant race) and keeps the pipe
+    drained so a chatty daemon never blocks on a full 64K buffer. Tests
+    read lines from proc.log_queue, never from proc.stderr directly.
+    `leftover` and `tail` come from wait_for_daemon_idle: raw lines
+    already consumed in the same burst as Idle are seeded into the
+    queue, and the partial tail becomes the reader's initial buffer.
+    """
+    proc.log_queue = queue.Queue()
+    for line in leftover:
+        proc.log_queue.put(line)
+    threading.Thread(
+        target=_drain_stderr, args=(proc, proc.log_queue, tail), daemon=True,
+    ).start()
+
+
+def _drain_stderr(proc, log_queue, tail=b""):
+    """Continuously move daemon stderr lines into log_queue until EOF.
+
+    Reads in bulk with os.read and splits on newlines here — one syscall
+    per burst of output instead of one buffered readline per line. Lines
+    are queued as raw bytes; decoding is left to the consumers below, so
+    lines nothing ever reads are never decoded and the reader thread
+    stays a pure pipe drain. `tail` is the partial line the startup scan
+    had already pulled off the pipe; it is completed by the next read.
+    """
+    fd = proc.stderr.fileno()
+    buf = tail
+    while True:
+        try:
+            chunk = os.read(fd, 65536)
+        except OSError:
+            break  # fd closed under us at daemon teardown
+        if not chunk:
+            break  # EOF: daemon exited
+        buf += chunk
+        *complete, buf = buf.split(b"\n")
+        for line in complete:
+            log_queue.put(line)
+    if buf:
+        log_queue.put(buf)
+
+
+def wait_for_state(proc, state="Idle", timeout=30, count=1):
+    """Read daemon log lines until `state` has appeared `count` times.
+
+    Event-driven replacement for worst-case sleeps: returns the moment
+    the daemon actually logs the transition, with `timeout` as the hard
+    ceiling. Lines come from proc.log_queue, fed by the stderr reader
+    thread the conftest daemon fixtures start, as raw bytes; the state
+    match runs on the bytes (the tokens are pure ASCII) and each line is
+    decoded once for the returned list. Pass count > 1 to drain several
+    queued cycles (one transition is logged per cycle).
+
+    Returns (found, collected_lines).
+    """
+    needle = state.encode()
+    lines = []
+    seen = 0
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or proc.poll() is not None:
+            return False, lines
+        try:
+            # Cap the wait so a dead daemon is noticed within ~50 ms;
+            # a pushed line still wakes the get immediately.
+            raw = proc.log_queue.get(timeout=min(remaining, 0.05))
+        except queue.Empty:
+            continue
+        lines.append(raw.decode("utf-8", errors="replace").strip())
+        if b"STATE:" in raw and needle in raw.split(b"STATE:")[-1]:
+            seen += 1
+            if seen >= count:
+                return True, lines
+
+
+def collect_stderr(proc, timeout=0.5):
+    """Drain available daemon log lines from the reader-thread queue.
+
+    Returns whatever arrives within the window; an empty queue ends the
+    drain early rather than waiting out the full timeout. The queue
+    carries raw bytes from the reader thread; lines are decoded here,
+    on the consuming side.
+    """
+    lines = []
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            raw = proc.log_queue.get(timeout=remaining)
+        except queue.Empty:
+            break
+        lines.append(raw.decode("utf-8", errors="replace").strip())
+    return lines
+
+
+def collect_until_quiet(proc, quiet=0.2, timeout=1.0):
+    """Drain daemon log lines until the stream goes quiet.
+
+    For negative assertions ("nothing else should happen"): returns as
+    soon as `quiet` seconds pass with no new line, so the common
+    nothing-arrived case costs `quiet` instead of a full guardband
+    sleep, while `timeout` caps a chatty daemon. Lines are decoded like
+    collect_stderr.
+    """
+    lines = []
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            raw = proc.log_queue.get(timeout=min(remaining, quiet))
+        except queue.Empty:
+            break
+        lines.append(raw.decode("utf-8", errors="replace").strip())
+    return lines
+
+
+def assert_alive_for(proc, seconds, message):
+    """Assert the process stays alive for the whole window.
+
+    proc.wait returns the moment the child exits, so a crashing daemon
+    fails the test in milliseconds instead of after a fixed sleep; a
+    healthy one still holds the test for the window.
+    """
+    try:
+        rc = proc.wait(timeout=seconds)
+    except subprocess.TimeoutExpired:
+        return
+    pytest.fail(f"{message} (exited early with code {rc})")
@@ -3,11 +3,10 @@
 
 import asyncio
 import re
-import xml.etree.ElementTree as ET
 
-from dbus_next.aio import MessageBus
-from dbus_next import BusType, Message, MessageType, Variant
-from dbus_next.introspection import Node
+from dbus_fast.aio import MessageBus
+from dbus_fast import BusType, Message, MessageFlag, MessageType, Variant
+from dbus_fast.introspection import Node
 
 
 PORTAL_BUS_NAME = "org.freedesktop.portal.Desktop"
@@ -21,29 +20,41 @@ KEYBOARD_DEVICE_BIT = 1
 POINTER_DEVICE_BIT = 2
 TOUCHSCREEN_DEVICE_BIT = 4
 
-_MEMBER_NAME_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
-
+# Strips <property>/<method>/<signal>/<arg> elements whose name attribute
+# contains a character that is invalid in a D-Bus member name (e.g. the
+# hyphen in 'power-saver-enabled'), including any element body. A single
+# regex pass over the raw XML is far cheaper than parsing the tree,
+# walking it, and re-serializing just to drop a handful of elements.
+_INVALID_MEMBER_TAG_RE = re.compile(
+    r'<(property|method|signal|arg)\s+[^>]*name="[^"]*[^A-Za-z0-9_"][^"]*"[^>]*'
+    r'(?:/>|>.*?</\1>)',
+    re.S | re.A,
+)
 
-def _strip_invalid_members(element):
-    """Remove XML elements whose 'name' attribute is not a valid D-Bus member name."""
-    to_remove = []
-    for child in element:
-        name = child.get("name", "")
-        if child.tag in ("property", "method", "signal", "arg") and name and not _MEMBER_NAME_RE.match(name):
-            to_remove.append(child)
-        else:
-            _strip_invalid_members(child)
-    for child in to_remove:
-        element.remove(child)
+# Introspection results per bus, keyed by (bus_name, object_path). Portal
+# introspection XML is static for a session, so each object is only ever
+# introspected once per connection. Keyed on the bus object itself (dbus-fast
+# buses don't support weakrefs); a test session only ever creates a handful
+# of connections, so the strong references are harmless.
+_INTROSPECTION_CACHE = {}
 
 
 async def safe_introspect(bus, bus_name, object_path):
     """Introspect a D-Bus object, stripping members with invalid names.
 
-    dbus_next strictly validates member names (no hyphens allowed), but some
+    dbus-fast strictly validates member names (no hyphens allowed), but some
     portal interfaces expose properties like 'power-saver-enabled'. This
-    fetches the raw XML and removes those members before parsing.
+    fetches the raw XML and drops those members with a single regex pass
+    before parsing.
+
+    Results are cached per (bus_name, object_path) for the lifetime of the
+    bus connection, so repeated proxy setup skips the Introspect round-trip.
     """
+    bus_cache = _INTROSPECTION_CACHE.setdefault(bus, {})
+    cached = bus_cache.get((bus_name, object_path))
+    if cached is not None:
+        return cached
+
     reply = await bus.call(
         Message(
             destination=bus_name,
@@ -56,45 +67,72 @@ async def safe_introspect(bus, bus_name, object_path):
     if reply.message_type == MessageType.ERROR:
         raise Exception(f"Introspection failed for {bus_name} at {object_path}: {reply.body}")
 
-    xml_str = reply.body[0]
-    root = ET.fromstring(xml_str)
-    _strip_invalid_members(root)
-    cleaned_xml = ET.tostring(root, encoding="unicode")
-    return Node.parse(cleaned_xml)
+    xml_str = _INVALID_MEMBER_TAG_RE.sub("", reply.body[0])
+    node = Node.parse(xml_str)
+    bus_cache[(bus_name, object_path)] = node
+    return node
 
 
 async def get_session_bus():
-    """Connect to the session D-Bus."""
+    """Connect to the session D-Bus.
+
+    dbus-fast pipelines the SASL handshake (AUTH/NEGOTIATE_UNIX_FD/BEGIN in
+    one write), so connecting costs a single round-trip plus Hello.
+    """
     return await MessageBus(bus_type=BusType.SESSION).connect()
 
 
 async def get_portal_proxy(bus):
     """Get a proxy object for the portal Desktop interface."""
     introspection = await safe_introspect(bus, PORTAL_BUS_NAME, PORTAL_OBJECT_PATH)
-    return bus.get_proxy_object(PORTAL_BUS_NAME, PORTAL_OBJECT_PATH, introspection)
+    proxy = bus.get_proxy_object(PORTAL_BUS_NAME, PORTAL_OBJECT_PATH, introspection)
+    proxy._iface_names = frozenset(i.name for i in introspection.interfaces)
+    return proxy
+
+
+async def get_all_properties(proxy, interface_name):
+    """Read all properties of a portal interface with one GetAll call.
+
+    The dict is memoized on the proxy, so reading several properties of
+    the same interface (version, AvailableDeviceTypes, ...) costs a
+    single round-trip for the lifetime of the proxy. Portal properties
+    are static for a session, so staleness is not a concern.
+    """
+    cache = getattr(proxy, "_props_cache", None)
+    if cache is None:
+        cache = proxy._props_cache = {}
+    props_dict = cache.get(interface_name)
+    if props_dict is None:
+        props = proxy.get_interface(PROPERTIES_IFACE)
+        props_dict = cache[interface_name] = await props.call_get_all(interface_name)
+    return props_dict
 
 
 async def get_interface_version(proxy, interface_name):
     """Read the 'version' property from a portal interface."""
-    props = proxy.get_interface(PROPERTIES_IFACE)
-    version_variant = await props.call_get(interface_name, "version")
-    return version_variant.value
+    props = await get_all_properties(proxy, interface_name)
+    return props["version"].value
 
 
 async def get_available_device_types(proxy):
     """Read AvailableDeviceTypes from RemoteDesktop interface."""
-    props = proxy.get_interface(PROPERTIES_IFACE)
-    types_variant = await props.call_get(REMOTE_DESKTOP_IFACE, "AvailableDeviceTypes")
-    return types_variant.value
+    props = await get_all_properties(proxy, REMOTE_DESKTOP_IFACE)
+    return props["AvailableDeviceTypes"].value
 
 
 async def has_interface(proxy, interface_name):
-    """Check if the portal exposes a given interface."""
-    try:
-        proxy.get_interface(interface_name)
-        return True
-    except Exception:
-        return False
+    """Check if the portal exposes a given interface.
+
+    A set lookup against the parsed introspection rather than an
+    exception-probed get_interface call. The name set is computed once
+    per proxy and cached on it.
+    """
+    names = getattr(proxy, "_iface_names", None)
+    if names is None:
+        names = proxy._iface_names = frozenset(
+            i.name for i in proxy.introspection.interfaces
+        )
+    return interface_name in names
 
 
 def has_keyboard_support(device_types_bitmask):
@@ -102,54 +140,138 @@ def has_keyboard_support(device_types_bitmask):
     return bool(device_types_bitmask & KEYBOARD_DEVICE_BIT)
 
 
-# Pre-built introspection for portal Request and Session interfaces.
-# These are well-defined by the XDG portal spec and don't require
-# introspecting ephemeral objects that may not exist yet.
-
-_REQUEST_INTROSPECTION = Node.parse(
-    '<node>'
-    '  <interface name="org.freedesktop.portal.Request">'
-    '    <method name="Close"/>'
-    '    <signal name="Response">'
-    '      <arg type="u" name="response"/>'
-    '      <arg type="a{sv}" name="results"/>'
-    '    </signal>'
-    '  </interface>'
-    '</node>'
-)
+# Per-bus routing tables for Response signals: bus -> {request_path: slot}.
+# One broad match rule per bus covers every portal request, so awaiting a
+# response costs a dict insert instead of a proxy build plus AddMatch
+# round-trip per request.
+_RESPONSE_ROUTERS = {}
+
 
-_SESSION_INTROSPECTION = Node.parse(
-    '<node>'
-    '  <interface name="org.freedesktop.portal.Session">'
-    '    <method name="Close"/>'
-    '    <signal name="Closed"/>'
-    '  </interface>'
-    '</node>'
+class _ResponseSlot:
+    """An Event plus result holder — lighter to set from the router than a
+    Future, which goes through loop callback scheduling."""
+
+    __slots__ = ("event", "result")
+
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.result = None
+
+_RESPONSE_MATCH_RULE = (
+    "type='signal',interface='org.freedesktop.portal.Request',member='Response'"
 )
 
 
-async def await_portal_response(bus, request_path, timeout=10):
-    """Wait for the portal Response signal on a request path.
+def _response_slots(bus):
+    """Return the Response-slot table for a bus, installing the router once.
 
-    Uses pre-built introspection to avoid racing with request object creation.
-    Returns (response_code, results_dict).
+    Synchronous on purpose: callers can arm a slot before issuing the
+    method call that will trigger the Response, closing the window in
+    which the signal could be missed.
     """
-    loop = asyncio.get_event_loop()
-    future = loop.create_future()
+    slots = _RESPONSE_ROUTERS.get(bus)
+    if slots is not None:
+        return slots
+    slots = _RESPONSE_ROUTERS[bus] = {}
+
+    def _router(msg):
+        if (
+            msg.message_type == MessageType.SIGNAL
+            and msg.interface == "org.freedesktop.portal.Request"
+            and msg.member == "Response"
+        ):
+            # Left in the table (not popped) so a Response that lands
+            # between arming and awaiting is still found by the awaiter,
+            # which removes the slot once collected.
+            slot = slots.get(msg.path)
+            if slot is not None:
+                slot.result = (msg.body[0], msg.body[1])
+                slot.event.set()
+
+    bus.add_message_handler(_router)
+    # Fire-and-forget: the bus daemon applies AddMatch in order, so no ack
+    # is needed before subsequent calls on this connection.
+    bus.send(
+        Message(
+            destination="org.freedesktop.DBus",
+            path="/org/freedesktop/DBus",
+            interface="org.freedesktop.DBus",
+            member="AddMatch",
+            signature="s",
+            body=[_RESPONSE_MATCH_RULE],
+            flags=MessageFlag.NO_REPLY_EXPECTED,
+        )
+    )
+    return slots
+
+
+def arm_portal_response(bus, request_path):
+    """Register for the Response on request_path, before the request is made.
 
-    def _on_response(response, results):
-        if not future.done():
-            future.set_result((response, results))
+    Arming is fully synchronous, so doing it ahead of the method call
+    that triggers the Response guarantees the signal cannot be lost —
+    no settle delay needed between subscribing and invoking. Collect
+    the result afterwards with await_portal_response.
+    """
+    slots = _response_slots(bus)
+    slot = slots.get(request_path)
+    if slot is None:
+        slot = slots[request_path] = _ResponseSlot()
+    return slot
 
-    proxy = bus.get_proxy_object(PORTAL_BUS_NAME, request_path, _REQUEST_INTROSPECTION)
-    request_iface = proxy.get_interface("org.freedesktop.portal.Request")
-    request_iface.on_response(_on_response)
 
-    return await asyncio.wait_for(future, timeout=timeout)
+async def await_portal_response(bus, request_path, timeout=10):
+    """Wait for the portal Response signal on a request path.
+
+    Routes through a single bus-wide match rule rather than building a
+    proxy and subscription per request. Returns (response_code, results_dict).
+    """
+    slots = _response_slots(bus)
+    slot = slots.get(request_path)
+    if slot is None:
+        slot = slots[request_path] = _ResponseSlot()
+    try:
+        # asyncio.timeout cancels in place rather than wrapping the wait
+        # in a fresh Task the way wait_for does.
+        async with asyncio.timeout(timeout):
+            await slot.event.wait()
+        return slot.result
+    finally:
+        if slots.get(request_path) is slot:
+            del slots[request_path]
+
+
+async def sync_bus(bus):
+    """Round-trip to the dbus-daemon, flushing earlier fire-and-forget sends.
+
+    The daemon processes messages from one connection in order, so by the
+    time GetId replies, every AddMatch this connection queued before the
+    call (e.g. from a proxy on_* registration) has taken effect. Replaces
+    guess-the-propagation-delay sleeps with a positive acknowledgement.
+    """
+    await bus.call(
+        Message(
+            destination="org.freedesktop.DBus",
+            path="/org/freedesktop/DBus",
+            interface="org.freedesktop.DBus",
+            member="GetId",
+        )
+    )
 
 
 async def close_portal_session(bus, session_handle):
-    """Close a portal session using pre-built introspection."""
-    proxy = bus.get_proxy_object(PORTAL_BUS_NAME, session_handle, _SESSION_INTROSPECTION)
-    session_iface = proxy.get_interface("org.freedesktop.portal.Session")
-    await session_iface.call_close()
+    """Close a portal session.
+
+    Sent with NO_REPLY_EXPECTED since nothing consumes the Close reply;
+    ordering on the connection still guarantees the portal processes the
+    Close before any later call from the same bus.
+    """
+    bus.send(
+        Message(
+            destination=PORTAL_BUS_NAME,
+            path=session_handle,
+            interface="org.freedesktop.portal.Session",
+            member="Close",
+            flags=MessageFlag.NO_REPLY_EXPECTED,
+        )
+    )
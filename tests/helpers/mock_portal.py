@@ -2,15 +2,20 @@
 # ABOUTME: Runs on a private dbus-daemon and implements GlobalShortcuts, RemoteDesktop, and Registry.
 
 import asyncio
+import copy
+import functools
+import os
+import selectors
 import subprocess
 import threading
 import time
 import uuid
+from collections import deque
 
-from dbus_next import Message, MessageType, Variant
-from dbus_next.aio import MessageBus
-from dbus_next.constants import PropertyAccess
-from dbus_next.service import ServiceInterface, dbus_property, method, signal
+from dbus_fast import Message, MessageType, Variant
+from dbus_fast.aio import MessageBus
+from dbus_fast.constants import PropertyAccess
+from dbus_fast.service import ServiceInterface, dbus_property, method, signal
 
 
 PORTAL_BUS_NAME = "org.freedesktop.portal.Desktop"
@@ -23,6 +28,33 @@ REQUEST_IFACE = "org.freedesktop.portal.Request"
 SESSION_IFACE = "org.freedesktop.portal.Session"
 
 
+# Introspection XML for ephemeral request/session objects, built once at
+# import instead of per Introspect call.
+
+REQUEST_INTROSPECT_XML = (
+    '<node>'
+    '  <interface name="org.freedesktop.portal.Request">'
+    '    <method name="Close"/>'
+    '    <signal name="Response">'
+    '      <arg type="u" name="response"/>'
+    '      <arg type="a{sv}" name="results"/>'
+    '    </signal>'
+    '  </interface>'
+    '</node>'
+)
+
+SESSION_INTROSPECT_XML = (
+    '<node>'
+    '  <interface name="org.freedesktop.portal.Session">'
+    '    <method name="Close"/>'
+    '    <signal name="Closed"/>'
+    '  </interface>'
+    '</node>'
+)
+
+EMPTY_INTROSPECT_XML = '<node />'
+
+
 # ---------------------------------------------------------------------------
 # Service interfaces (property exposure + introspection)
 # ---------------------------------------------------------------------------
@@ -31,7 +63,7 @@ class GlobalShortcutsService(ServiceInterface):
     """Exposes GlobalShortcuts properties and method signatures for introspection.
 
     Method bodies are never called — the raw message handler intercepts all
-    method calls before dbus_next dispatches to the ServiceInterface.
+    method calls before dbus_fast dispatches to the ServiceInterface.
     """
 
     def __init__(self):
@@ -125,57 +157,104 @@ class PortalController:
     def __init__(self, bus, loop):
         self._bus = bus
         self._loop = loop
-        self._keysym_log = []
-        self._lock = threading.Lock()
+        # deque append/clear and list() snapshots are atomic under the GIL,
+        # so the keysym log needs no lock between the portal loop thread
+        # (writer) and test threads (readers).
+        self._keysym_log = deque()
         self._sessions = {}  # session_path -> session state
         self._bound_shortcuts = {}  # session_path -> list of shortcut defs
+        self._bind_response_cache = {}  # shortcut-set key -> response list
+
+    def _do_emit(self, member, shortcut_id):
+        """Build and send a shortcut signal to every session (loop thread).
+
+        Iterates _sessions directly: register/remove only run in handlers
+        dispatched on this same loop, so no defensive copy is needed.
+        """
+        # time_ns avoids the float multiply-and-truncate of time()*1000;
+        # wall time is kept (not a counter) since the daemon may compare
+        # Activated/Deactivated timestamps for hold durations.
+        timestamp = time.time_ns() // 1_000_000
+        for session_path in self._sessions:
+            msg = Message.new_signal(
+                PORTAL_OBJECT_PATH,
+                GLOBAL_SHORTCUTS_IFACE,
+                member,
+            )
+            msg.signature = "osta{sv}"
+            msg.body = [session_path, shortcut_id, timestamp, {}]
+            self._bus.send(msg)
 
     def emit_activated(self, shortcut_id="dictate_hold"):
-        """Emit a GlobalShortcuts Activated signal for the given shortcut."""
-        async def _emit():
-            for session_path in list(self._sessions.keys()):
-                timestamp = int(time.time() * 1000)
-                msg = Message.new_signal(
-                    PORTAL_OBJECT_PATH,
-                    GLOBAL_SHORTCUTS_IFACE,
-                    "Activated",
-                )
-                msg.signature = "osta{sv}"
-                msg.body = [session_path, shortcut_id, timestamp, {}]
-                await self._bus.send(msg)
+        """Emit a GlobalShortcuts Activated signal for the given shortcut.
 
-        asyncio.run_coroutine_threadsafe(_emit(), self._loop).result(timeout=5)
+        bus.send is synchronous in dbus-next, so a plain callback via
+        call_soon_threadsafe suffices — no coroutine, task, or
+        cross-thread Future.result round-trip per emit. call_soon_
+        threadsafe is FIFO, so back-to-back emits keep their order.
+        """
+        self._loop.call_soon_threadsafe(self._do_emit, "Activated", shortcut_id)
 
     def emit_deactivated(self, shortcut_id="dictate_hold"):
         """Emit a GlobalShortcuts Deactivated signal for the given shortcut."""
-        async def _emit():
-            for session_path in list(self._sessions.keys()):
-                timestamp = int(time.time() * 1000)
-                msg = Message.new_signal(
-                    PORTAL_OBJECT_PATH,
-                    GLOBAL_SHORTCUTS_IFACE,
-                    "Deactivated",
-                )
-                msg.signature = "osta{sv}"
-                msg.body = [session_path, shortcut_id, timestamp, {}]
-                await self._bus.send(msg)
-
-        asyncio.run_coroutine_threadsafe(_emit(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(
+            self._do_emit, "Deactivated", shortcut_id,
+        )
+
+    def emit_burst(self, pairs, interval=0.0, shortcut_id="dictate_hold"):
+        """Emit `pairs` Activated/Deactivated pairs, paced on the loop side.
+
+        The pacing runs via call_later on the portal loop instead of
+        client-side sleeps, so the caller schedules the whole burst with
+        one cross-thread hop and the signals hit the bus at the requested
+        cadence regardless of test-thread scheduling. Blocks until the
+        last signal has been sent so callers can immediately start
+        waiting for the daemon to settle.
+        """
+        done = threading.Event()
+
+        def _step(remaining, member):
+            self._do_emit(member, shortcut_id)
+            if member == "Activated":
+                nxt = (remaining, "Deactivated")
+            elif remaining > 1:
+                nxt = (remaining - 1, "Activated")
+            else:
+                done.set()
+                return
+            if interval > 0:
+                self._loop.call_later(interval, _step, *nxt)
+            else:
+                _step(*nxt)
+
+        if pairs > 0:
+            self._loop.call_soon_threadsafe(_step, pairs, "Activated")
+        else:
+            done.set()
+        done.wait(timeout=2 * pairs * interval + 5)
 
     def log_keysym(self, keysym, state):
-        """Record a keysym event from NotifyKeyboardKeysym."""
-        with self._lock:
-            self._keysym_log.append((keysym, state))
+        """Record a keysym event from NotifyKeyboardKeysym.
+
+        Events are packed into a single int (keysym in the high 32 bits,
+        state in the low) so the hot path does one atomic append with no
+        tuple allocation; decoding happens on snapshot, off the hot path.
+        """
+        self._keysym_log.append(((keysym & 0xFFFFFFFF) << 32) | (state & 0xFFFFFFFF))
 
     def get_keysym_log(self):
-        """Return a copy of all logged keysym events."""
-        with self._lock:
-            return list(self._keysym_log)
+        """Return a copy of all logged keysym events as (keysym, state)."""
+        log = []
+        for packed in list(self._keysym_log):
+            keysym = packed >> 32
+            if keysym >= 0x80000000:  # keysym wire type is signed i32
+                keysym -= 0x100000000
+            log.append((keysym, packed & 0xFFFFFFFF))
+        return log
 
     def clear_keysym_log(self):
         """Clear the keysym log."""
-        with self._lock:
-            self._keysym_log.clear()
+        self._keysym_log.clear()
 
     def register_session(self, session_path, session_type):
         """Track a created session."""
@@ -194,6 +273,84 @@ class PortalController:
         """Get bound shortcuts for a session, or None."""
         return self._bound_shortcuts.get(session_path)
 
+    def reset(self):
+        """Drop all portal state: sessions, bound shortcuts, keysym log.
+
+        For tests that spawn their own daemons: without this, sessions
+        left behind by a previous test's (now dead) daemon accumulate
+        and still receive every emitted signal.
+
+        Runs on the portal loop thread: _do_emit iterates _sessions
+        without a snapshot on the guarantee that the dict only mutates
+        on that loop, so clearing directly from the test thread could
+        change it mid-iteration and drop a signal. The wait preserves
+        caller ordering — state is gone when reset returns.
+        """
+        done = threading.Event()
+
+        def _clear():
+            self._sessions.clear()
+            self._bound_shortcuts.clear()
+            self._bind_response_cache.clear()
+            self._keysym_log.clear()
+            done.set()
+
+        self._loop.call_soon_threadsafe(_clear)
+        done.wait(timeout=5)
+
+    def snapshot_state(self):
+        """Capture the current sessions and bindings for restore_state.
+
+        For modules that reset() around their own daemons: the portal is
+        session-scoped, so a reset also forgets sessions owned by other
+        files' still-alive daemons. Snapshotting before the first reset
+        and restoring at teardown keeps those sessions receiving signals
+        afterwards. Copied on the loop thread like reset.
+        """
+        out = {}
+        done = threading.Event()
+
+        def _snap():
+            out["sessions"] = dict(self._sessions)
+            out["bound"] = dict(self._bound_shortcuts)
+            done.set()
+
+        self._loop.call_soon_threadsafe(_snap)
+        done.wait(timeout=5)
+        return out
+
+    def restore_state(self, snapshot):
+        """Reinstate sessions captured by snapshot_state.
+
+        Replaces the current tables outright: anything registered since
+        the snapshot belongs to daemons the snapshotting module has
+        already stopped, which is exactly the state reset() exists to
+        drop.
+        """
+        done = threading.Event()
+
+        def _restore():
+            self._sessions.clear()
+            self._sessions.update(snapshot["sessions"])
+            self._bound_shortcuts.clear()
+            self._bound_shortcuts.update(snapshot["bound"])
+            done.set()
+
+        self._loop.call_soon_threadsafe(_restore)
+        done.wait(timeout=5)
+
+
+# keysym -> char lookup table: Return, Tab, and the printable ASCII range
+# (where the keysym equals the codepoint) are precomputed at import;
+# Unicode-range keysyms (0x01000000 + codepoint) are memoized into it on
+# first sight, so every repeated character costs one dict hit with no
+# range-check branch.
+_KEYSYM_TO_CHAR = {
+    0xff0d: "\n",  # XKB_KEY_Return
+    0xff09: "\t",  # XKB_KEY_Tab
+    **{k: chr(k) for k in range(0x20, 0x7f)},
+}
+
 
 def keysyms_to_text(log):
     """Convert a keysym log (list of (keysym, state) tuples) to a string.
@@ -201,26 +358,19 @@ def keysyms_to_text(log):
     Only considers "pressed" events (state=1) and maps keysyms to chars.
     Press-release pairs each produce one character.
     """
-    XKB_KEY_RETURN = 0xff0d
-    XKB_KEY_TAB = 0xff09
-
+    table = _KEYSYM_TO_CHAR
     chars = []
+    append = chars.append
+    get = table.get
     for keysym, state in log:
         if state != 1:  # Only pressed events produce characters
             continue
-        if keysym == XKB_KEY_RETURN:
-            chars.append("\n")
-        elif keysym == XKB_KEY_TAB:
-            chars.append("\t")
-        elif 0x01000000 <= keysym <= 0x0110ffff:
-            # Unicode keysym range: keysym = 0x01000000 + codepoint
-            chars.append(chr(keysym - 0x01000000))
-        elif 0x20 <= keysym <= 0x7e:
-            # Latin-1 printable ASCII maps directly
-            chars.append(chr(keysym))
-        else:
-            # Other keysyms we can't easily map; skip
-            pass
+        c = get(keysym)
+        if c is None and 0x01000000 <= keysym <= 0x0110ffff:
+            c = table[keysym] = chr(keysym - 0x01000000)
+        if c is not None:
+            append(c)
+        # Other keysyms we can't easily map; skip
     return "".join(chars)
 
 
@@ -228,16 +378,25 @@ def keysyms_to_text(log):
 # Raw message handler
 # ---------------------------------------------------------------------------
 
+REQUEST_PATH_PREFIX = "/org/freedesktop/portal/desktop/request/"
+SESSION_PATH_PREFIX = "/org/freedesktop/portal/desktop/session/"
+
+
+@functools.lru_cache(maxsize=256)
+def _escape_sender(sender):
+    """Escape a unique bus name for use in an object path (memoized —
+    a connection's sender string never changes)."""
+    return sender.replace(".", "_").replace(":", "")
+
+
 def _make_request_path(sender, token):
     """Build the portal request object path from sender and token."""
-    sender_escaped = sender.replace(".", "_").replace(":", "")
-    return f"/org/freedesktop/portal/desktop/request/{sender_escaped}/{token}"
+    return f"{REQUEST_PATH_PREFIX}{_escape_sender(sender)}/{token}"
 
 
 def _make_session_path(sender, token):
     """Build the portal session object path from sender and token."""
-    sender_escaped = sender.replace(".", "_").replace(":", "")
-    return f"/org/freedesktop/portal/desktop/session/{sender_escaped}/{token}"
+    return f"{SESSION_PATH_PREFIX}{_escape_sender(sender)}/{token}"
 
 
 def _gen_token():
@@ -245,264 +404,314 @@ def _gen_token():
     return uuid.uuid4().hex[:16]
 
 
-def _create_message_handler(bus, controller, loop):
-    """Create a raw message handler that intercepts portal method calls.
+def _opt_str(options, key):
+    """Read a string option, generating a token only when it's absent.
 
-    Handles the request/response pattern: returns the request path immediately,
-    then schedules a Response signal emission after a short delay.
+    Passing _gen_token() as a .get() default would wrap a fresh UUID in a
+    Variant on every call even when the key exists (ashpd always sends
+    handle tokens), wasting an os.urandom syscall per request.
     """
+    v = options.get(key)
+    return v.value if v is not None else _gen_token()
 
-    def handler(msg):
-        if msg.message_type != MessageType.METHOD_CALL:
-            return False
 
-        iface = msg.interface
-        member = msg.member
-        sender = msg.sender
-
-        path = msg.path or ""
-
-        # For the portal object path, let Properties/Introspectable pass
-        # through to the ServiceInterface handlers
-        if iface in (
-            "org.freedesktop.DBus.Properties",
-            "org.freedesktop.DBus.Introspectable",
-            "org.freedesktop.DBus.Peer",
-        ):
-            if path == PORTAL_OBJECT_PATH:
-                return False
-            # For request/session subpaths, reply with minimal introspection
-            # to prevent "no interfaces at path" errors
-            if iface == "org.freedesktop.DBus.Introspectable" and member == "Introspect":
-                xml = '<node />'
-                if "/request/" in path:
-                    xml = (
-                        '<node>'
-                        '  <interface name="org.freedesktop.portal.Request">'
-                        '    <method name="Close"/>'
-                        '    <signal name="Response">'
-                        '      <arg type="u" name="response"/>'
-                        '      <arg type="a{sv}" name="results"/>'
-                        '    </signal>'
-                        '  </interface>'
-                        '</node>'
-                    )
-                elif "/session/" in path:
-                    # Only expose Session interface if the session is still alive
-                    if path in controller._sessions:
-                        xml = (
-                            '<node>'
-                            '  <interface name="org.freedesktop.portal.Session">'
-                            '    <method name="Close"/>'
-                            '    <signal name="Closed"/>'
-                            '  </interface>'
-                            '</node>'
-                        )
-                reply = Message.new_method_return(msg)
-                reply.signature = "s"
-                reply.body = [xml]
-                bus.send(reply)
-                return True
-            if iface == "org.freedesktop.DBus.Properties":
-                # Return empty properties for request/session paths
-                if member == "GetAll":
-                    reply = Message.new_method_return(msg)
-                    reply.signature = "a{sv}"
-                    reply.body = [{}]
-                    bus.send(reply)
-                    return True
-                if member == "Get":
-                    from dbus_next import ErrorType
-                    reply = Message.new_error(
-                        msg,
-                        ErrorType.UNKNOWN_PROPERTY.value,
-                        f"No properties at {path}",
-                    )
-                    bus.send(reply)
-                    return True
-            return False
+def _handle_meta(msg, bus, controller, loop):
+    """Introspectable/Properties for ephemeral request/session subpaths.
+
+    The portal object path itself falls through to the ServiceInterface
+    handlers; subpaths get minimal replies so clients don't see
+    "no interfaces at path" errors.
+    """
+    iface = msg.interface
+    member = msg.member
+    path = msg.path or ""
 
-        # --- Registry.Register ---
-        if iface == REGISTRY_IFACE and member == "Register":
+    if path == PORTAL_OBJECT_PATH:
+        return False
+
+    if iface == "org.freedesktop.DBus.Introspectable" and member == "Introspect":
+        if path.startswith(REQUEST_PATH_PREFIX):
+            xml = REQUEST_INTROSPECT_XML
+        elif path.startswith(SESSION_PATH_PREFIX) and path in controller._sessions:
+            # Only expose Session interface while the session is alive
+            xml = SESSION_INTROSPECT_XML
+        else:
+            xml = EMPTY_INTROSPECT_XML
+        reply = Message.new_method_return(msg)
+        reply.signature = "s"
+        reply.body = [xml]
+        bus.send(reply)
+        return True
+
+    if iface == "org.freedesktop.DBus.Properties":
+        # Return empty properties for request/session paths
+        if member == "GetAll":
             reply = Message.new_method_return(msg)
+            reply.signature = "a{sv}"
+            reply.body = [{}]
+            bus.send(reply)
+            return True
+        if member == "Get":
+            from dbus_fast import ErrorType
+            reply = Message.new_error(
+                msg,
+                ErrorType.UNKNOWN_PROPERTY.value,
+                f"No properties at {path}",
+            )
             bus.send(reply)
             return True
 
-        # --- GlobalShortcuts.CreateSession ---
-        if iface == GLOBAL_SHORTCUTS_IFACE and member == "CreateSession":
-            options = msg.body[0] if msg.body else {}
-            handle_token = options.get("handle_token", Variant("s", _gen_token())).value
-            session_token = options.get("session_handle_token", Variant("s", _gen_token())).value
+    return False
 
-            request_path = _make_request_path(sender, handle_token)
-            session_path = _make_session_path(sender, session_token)
 
-            controller.register_session(session_path, "shortcuts")
+def _handle_registry_register(msg, bus, controller, loop):
+    bus.send(Message.new_method_return(msg))
+    return True
 
-            # Reply with the request handle
-            reply = Message.new_method_return(msg)
-            reply.signature = "o"
-            reply.body = [request_path]
-            bus.send(reply)
 
-            # Schedule Response signal
-            _schedule_response(bus, loop, request_path, sender, {
-                "session_handle": Variant("s", session_path),
-            })
-            return True
+def _create_session(msg, bus, controller, loop, session_type):
+    """Shared CreateSession flow for GlobalShortcuts and RemoteDesktop."""
+    sender = msg.sender
+    options = msg.body[0] if msg.body else {}
+    handle_token = _opt_str(options, "handle_token")
+    session_token = _opt_str(options, "session_handle_token")
 
-        # --- GlobalShortcuts.BindShortcuts ---
-        if iface == GLOBAL_SHORTCUTS_IFACE and member == "BindShortcuts":
-            session_handle = msg.body[0]
-            shortcuts_arg = msg.body[1]
-            # body[2] = parent_window (s)
-            options = msg.body[3] if len(msg.body) > 3 else {}
-            handle_token = options.get("handle_token", Variant("s", _gen_token())).value
-
-            request_path = _make_request_path(sender, handle_token)
-
-            # Check for duplicate bind
-            if controller.get_bound_shortcuts(session_handle) is not None:
-                reply = Message.new_method_return(msg)
-                reply.signature = "o"
-                reply.body = [request_path]
-                bus.send(reply)
-                _schedule_response(bus, loop, request_path, sender, {},
-                                   response_code=2)
-                return True
-
-            # Record the bound shortcuts
-            controller.set_bound_shortcuts(session_handle, shortcuts_arg)
-
-            # Build the response shortcuts with fields ashpd expects
-            bound = []
-            for shortcut in shortcuts_arg:
-                shortcut_id = shortcut[0]
-                shortcut_opts = shortcut[1] if len(shortcut) > 1 else {}
-                response_opts = dict(shortcut_opts)
-                # ashpd requires trigger_description in the response
-                if "trigger_description" not in response_opts:
-                    trigger = response_opts.get(
-                        "preferred-trigger", Variant("s", ""),
-                    ).value
-                    response_opts["trigger_description"] = Variant(
-                        "s", trigger or "Super+Space",
-                    )
-                bound.append([shortcut_id, response_opts])
+    request_path = _make_request_path(sender, handle_token)
+    session_path = _make_session_path(sender, session_token)
 
-            reply = Message.new_method_return(msg)
-            reply.signature = "o"
-            reply.body = [request_path]
-            bus.send(reply)
+    controller.register_session(session_path, session_type)
 
-            _schedule_response(bus, loop, request_path, sender, {
-                "shortcuts": Variant("a(sa{sv})", bound),
-            })
-            return True
+    # Reply with the request handle
+    reply = Message.new_method_return(msg)
+    reply.signature = "o"
+    reply.body = [request_path]
+    bus.send(reply)
 
-        # --- RemoteDesktop.CreateSession ---
-        if iface == REMOTE_DESKTOP_IFACE and member == "CreateSession":
-            options = msg.body[0] if msg.body else {}
-            handle_token = options.get("handle_token", Variant("s", _gen_token())).value
-            session_token = options.get("session_handle_token", Variant("s", _gen_token())).value
+    # Schedule Response signal
+    _schedule_response(bus, loop, request_path, sender, {
+        "session_handle": Variant("s", session_path),
+    })
+    return True
 
-            request_path = _make_request_path(sender, handle_token)
-            session_path = _make_session_path(sender, session_token)
 
-            controller.register_session(session_path, "remote_desktop")
+def _handle_gs_create_session(msg, bus, controller, loop):
+    return _create_session(msg, bus, controller, loop, "shortcuts")
 
-            reply = Message.new_method_return(msg)
-            reply.signature = "o"
-            reply.body = [request_path]
-            bus.send(reply)
 
-            _schedule_response(bus, loop, request_path, sender, {
-                "session_handle": Variant("s", session_path),
-            })
-            return True
+def _handle_gs_bind_shortcuts(msg, bus, controller, loop):
+    sender = msg.sender
+    session_handle = msg.body[0]
+    shortcuts_arg = msg.body[1]
+    # body[2] = parent_window (s)
+    options = msg.body[3] if len(msg.body) > 3 else {}
+    handle_token = _opt_str(options, "handle_token")
 
-        # --- RemoteDesktop.SelectDevices ---
-        if iface == REMOTE_DESKTOP_IFACE and member == "SelectDevices":
-            # body: (session_handle: o, options: a{sv})
-            options = msg.body[1] if len(msg.body) > 1 else {}
-            handle_token = options.get("handle_token", Variant("s", _gen_token())).value
+    request_path = _make_request_path(sender, handle_token)
 
-            request_path = _make_request_path(sender, handle_token)
+    # Check for duplicate bind
+    if controller.get_bound_shortcuts(session_handle) is not None:
+        reply = Message.new_method_return(msg)
+        reply.signature = "o"
+        reply.body = [request_path]
+        bus.send(reply)
+        _schedule_response(bus, loop, request_path, sender, {},
+                           response_code=2)
+        return True
 
-            reply = Message.new_method_return(msg)
-            reply.signature = "o"
-            reply.body = [request_path]
-            bus.send(reply)
+    # Record the bound shortcuts
+    controller.set_bound_shortcuts(session_handle, shortcuts_arg)
 
-            _schedule_response(bus, loop, request_path, sender, {})
-            return True
+    # Same shortcut set -> same response payload; daemon restarts rebind
+    # identical shortcuts, so memoize by id and option values (Variants
+    # themselves aren't hashable).
+    cache_key = tuple(
+        (s[0], tuple(sorted(
+            (k, str(v.value)) for k, v in (s[1] if len(s) > 1 else {}).items()
+        )))
+        for s in shortcuts_arg
+    )
+    bound = controller._bind_response_cache.get(cache_key)
+    if bound is None:
+        # Build the response shortcuts with fields ashpd expects
+        bound = []
+        for shortcut in shortcuts_arg:
+            shortcut_id = shortcut[0]
+            shortcut_opts = shortcut[1] if len(shortcut) > 1 else {}
+            response_opts = dict(shortcut_opts)
+            # ashpd requires trigger_description in the response
+            if "trigger_description" not in response_opts:
+                trigger = response_opts.get(
+                    "preferred-trigger", Variant("s", ""),
+                ).value
+                response_opts["trigger_description"] = Variant(
+                    "s", trigger or "Super+Space",
+                )
+            bound.append([shortcut_id, response_opts])
+        controller._bind_response_cache[cache_key] = bound
 
-        # --- RemoteDesktop.Start ---
-        if iface == REMOTE_DESKTOP_IFACE and member == "Start":
-            # body: (session_handle: o, parent_window: s, options: a{sv})
-            options = msg.body[2] if len(msg.body) > 2 else {}
-            handle_token = options.get("handle_token", Variant("s", _gen_token())).value
+    reply = Message.new_method_return(msg)
+    reply.signature = "o"
+    reply.body = [request_path]
+    bus.send(reply)
 
-            request_path = _make_request_path(sender, handle_token)
+    _schedule_response(bus, loop, request_path, sender, {
+        "shortcuts": Variant("a(sa{sv})", bound),
+    })
+    return True
 
-            # Generate a restore token for the daemon
-            restore_token = f"mock-restore-token-{_gen_token()}"
 
-            reply = Message.new_method_return(msg)
-            reply.signature = "o"
-            reply.body = [request_path]
-            bus.send(reply)
+def _handle_rd_create_session(msg, bus, controller, loop):
+    return _create_session(msg, bus, controller, loop, "remote_desktop")
 
-            _schedule_response(bus, loop, request_path, sender, {
-                "devices": Variant("u", 7),  # keyboard | pointer | touchscreen
-                "restore_token": Variant("s", restore_token),
-            })
-            return True
 
-        # --- RemoteDesktop.NotifyKeyboardKeysym ---
-        if iface == REMOTE_DESKTOP_IFACE and member == "NotifyKeyboardKeysym":
-            # body: (session_handle: o, options: a{sv}, keysym: i, state: u)
-            keysym = msg.body[2]
-            state = msg.body[3]
-            controller.log_keysym(keysym, state)
+def _handle_rd_select_devices(msg, bus, controller, loop):
+    # body: (session_handle: o, options: a{sv})
+    sender = msg.sender
+    options = msg.body[1] if len(msg.body) > 1 else {}
+    handle_token = _opt_str(options, "handle_token")
 
-            reply = Message.new_method_return(msg)
-            bus.send(reply)
-            return True
+    request_path = _make_request_path(sender, handle_token)
 
-        # --- Session.Close ---
-        if iface == SESSION_IFACE and member == "Close":
-            path = msg.path
-            controller.remove_session(path)
+    reply = Message.new_method_return(msg)
+    reply.signature = "o"
+    reply.body = [request_path]
+    bus.send(reply)
 
-            reply = Message.new_method_return(msg)
-            bus.send(reply)
+    _schedule_response(bus, loop, request_path, sender, {})
+    return True
 
-            # Emit Closed signal
-            closed_msg = Message.new_signal(path, SESSION_IFACE, "Closed")
-            bus.send(closed_msg)
-            return True
 
-        # --- Request.Close ---
-        if iface == REQUEST_IFACE and member == "Close":
-            reply = Message.new_method_return(msg)
-            bus.send(reply)
-            return True
+def _handle_rd_start(msg, bus, controller, loop):
+    # body: (session_handle: o, parent_window: s, options: a{sv})
+    sender = msg.sender
+    options = msg.body[2] if len(msg.body) > 2 else {}
+    handle_token = _opt_str(options, "handle_token")
+
+    request_path = _make_request_path(sender, handle_token)
+
+    # Generate a restore token for the daemon
+    restore_token = f"mock-restore-token-{_gen_token()}"
+
+    reply = Message.new_method_return(msg)
+    reply.signature = "o"
+    reply.body = [request_path]
+    bus.send(reply)
+
+    _schedule_response(bus, loop, request_path, sender, {
+        "devices": Variant("u", 7),  # keyboard | pointer | touchscreen
+        "restore_token": Variant("s", restore_token),
+    })
+    return True
+
+
+def _handle_rd_notify_keysym(msg, bus, controller, loop):
+    # body: (session_handle: o, options: a{sv}, keysym: i, state: u)
+    controller.log_keysym(msg.body[2], msg.body[3])
+    bus.send(Message.new_method_return(msg))
+    return True
+
+
+def _handle_session_close(msg, bus, controller, loop):
+    path = msg.path
+    controller.remove_session(path)
+
+    bus.send(Message.new_method_return(msg))
+
+    # Emit Closed signal
+    bus.send(Message.new_signal(path, SESSION_IFACE, "Closed"))
+    return True
+
+
+def _handle_request_close(msg, bus, controller, loop):
+    bus.send(Message.new_method_return(msg))
+    return True
+
+
+_META_IFACES = (
+    "org.freedesktop.DBus.Properties",
+    "org.freedesktop.DBus.Introspectable",
+    "org.freedesktop.DBus.Peer",
+)
+
+# Enum members are singletons, so the handler compares with `is` against
+# this module-level binding (LOAD_GLOBAL) instead of enum __eq__ dispatch
+# plus an attribute walk per message.
+_METHOD_CALL = MessageType.METHOD_CALL
+
+# O(1) (interface, member) -> handler lookup replacing the old chained
+# string-comparison cascade.
+_DISPATCH = {
+    (REGISTRY_IFACE, "Register"): _handle_registry_register,
+    (GLOBAL_SHORTCUTS_IFACE, "CreateSession"): _handle_gs_create_session,
+    (GLOBAL_SHORTCUTS_IFACE, "BindShortcuts"): _handle_gs_bind_shortcuts,
+    (REMOTE_DESKTOP_IFACE, "CreateSession"): _handle_rd_create_session,
+    (REMOTE_DESKTOP_IFACE, "SelectDevices"): _handle_rd_select_devices,
+    (REMOTE_DESKTOP_IFACE, "Start"): _handle_rd_start,
+    (REMOTE_DESKTOP_IFACE, "NotifyKeyboardKeysym"): _handle_rd_notify_keysym,
+    (SESSION_IFACE, "Close"): _handle_session_close,
+    (REQUEST_IFACE, "Close"): _handle_request_close,
+}
+
+
+def _create_message_handler(bus, controller, loop):
+    """Create a raw message handler that intercepts portal method calls.
+
+    Handles the request/response pattern: returns the request path immediately,
+    then schedules a Response signal emission after a short delay.
+    """
+
+    def handler(msg):
+        if msg.message_type is not _METHOD_CALL:
+            return False
+
+        # Portal method calls (the hot path) resolve on the first lookup;
+        # only misses go on to the path-dependent meta-interface handling.
+        # Bind the interface once — sub-handlers pull sender/path/body
+        # themselves, so nothing else is dereferenced on a miss.
+        iface = msg.interface
+        fn = _DISPATCH.get((iface, msg.member))
+        if fn is not None:
+            return fn(msg, bus, controller, loop)
+
+        if iface in _META_IFACES:
+            return _handle_meta(msg, bus, controller, loop)
 
         return False
 
     return handler
 
 
+# Template for Response signals: all fields except path/body are identical
+# for every response, so copies skip the constructor's header validation.
+# The bus assigns a fresh serial on send since copies start with serial 0.
+_RESPONSE_TEMPLATE = Message.new_signal("/", REQUEST_IFACE, "Response")
+_RESPONSE_TEMPLATE.signature = "ua{sv}"
+
+
+def _send_response(bus, request_path, response_code, results):
+    """Emit a portal Response signal."""
+    sig = copy.copy(_RESPONSE_TEMPLATE)
+    sig.path = request_path
+    sig.body = [response_code, results]
+    bus.send(sig)
+
+
 def _schedule_response(bus, loop, request_path, destination, results,
-                       response_code=0, delay=0.05):
-    """Schedule a portal Response signal after a short delay."""
+                       response_code=0, delay=0):
+    """Send a portal Response signal, optionally after a delay.
+
+    The default is immediate: the signal goes out synchronously right
+    behind the method reply (handlers run on the portal loop thread), so
+    clients that subscribe before calling — as the spec requires and both
+    ashpd and the test helpers do — see it with zero added latency. Pass
+    a delay only to simulate a slow portal."""
+    if delay == 0:
+        _send_response(bus, request_path, response_code, results)
+        return
+
     async def _send():
         await asyncio.sleep(delay)
-        sig = Message.new_signal(request_path, REQUEST_IFACE, "Response")
-        sig.signature = "ua{sv}"
-        sig.body = [response_code, results]
-        bus.send(sig)
+        _send_response(bus, request_path, response_code, results)
 
     asyncio.run_coroutine_threadsafe(_send(), loop)
 
@@ -519,6 +728,12 @@ def start_mock_portal():
     - bus_address: DBUS_SESSION_BUS_ADDRESS for the daemon subprocess
     - controller: PortalController for test interaction
     - stop_fn: callable to shut everything down
+
+    The portal deliberately runs its own event loop in a background
+    thread rather than sharing the pytest-asyncio loop: the voxkey
+    daemon subprocess talks to the portal the entire time, including
+    while synchronous tests block the main thread in time.sleep, so the
+    portal must stay responsive off-thread.
     """
     # Start a private dbus-daemon
     dbus_proc = subprocess.Popen(
@@ -527,17 +742,41 @@ def start_mock_portal():
         stderr=subprocess.PIPE,
     )
 
-    # Read the bus address from stdout
-    address_line = dbus_proc.stdout.readline().decode("utf-8").strip()
-    if not address_line:
-        dbus_proc.kill()
-        raise RuntimeError("dbus-daemon did not print an address")
+    # Read the bus address with a hard deadline instead of a readline that
+    # can block forever if dbus-daemon wedges before printing.
+    fd = dbus_proc.stdout.fileno()
+    os.set_blocking(fd, False)
+    sel = selectors.DefaultSelector()
+    sel.register(dbus_proc.stdout, selectors.EVENT_READ)
+    buf = b""
+    deadline = time.monotonic() + 10
+    try:
+        while b"\n" not in buf:
+            remaining = deadline - time.monotonic()
+            if (
+                remaining <= 0
+                or dbus_proc.poll() is not None
+                or not sel.select(remaining)
+            ):
+                dbus_proc.kill()
+                raise RuntimeError("dbus-daemon did not print an address")
+            try:
+                chunk = os.read(fd, 4096)
+            except BlockingIOError:
+                continue
+            if not chunk:
+                dbus_proc.kill()
+                raise RuntimeError("dbus-daemon did not print an address")
+            buf += chunk
+    finally:
+        sel.close()
 
-    bus_address = address_line
+    bus_address = buf.split(b"\n", 1)[0].decode("utf-8").strip()
 
     # Set up asyncio loop in a background thread
     loop = asyncio.new_event_loop()
     controller = [None]  # mutable container for closure
+    stop_event = [None]  # asyncio.Event, created on the loop
     ready_event = threading.Event()
     error_container = [None]
 
@@ -545,7 +784,7 @@ def start_mock_portal():
         asyncio.set_event_loop(loop)
         try:
             loop.run_until_complete(_setup_and_run(
-                bus_address, loop, controller, ready_event,
+                bus_address, loop, controller, stop_event, ready_event,
             ))
         except Exception as e:
             error_container[0] = e
@@ -566,7 +805,7 @@ def start_mock_portal():
     ctrl = controller[0]
 
     def stop():
-        loop.call_soon_threadsafe(loop.stop)
+        loop.call_soon_threadsafe(stop_event[0].set)
         thread.join(timeout=5)
         dbus_proc.terminate()
         try:
@@ -578,7 +817,8 @@ def start_mock_portal():
     return bus_address, ctrl, stop
 
 
-async def _setup_and_run(bus_address, loop, controller_out, ready_event):
+async def _setup_and_run(bus_address, loop, controller_out, stop_event_out,
+                         ready_event):
     """Connect to the private bus, export interfaces, and run."""
     bus = await MessageBus(bus_address=bus_address).connect()
 
@@ -601,13 +841,15 @@ async def _setup_and_run(bus_address, loop, controller_out, ready_event):
     # Request the well-known portal bus name
     await bus.request_name(PORTAL_BUS_NAME)
 
+    # Park until stop() fires — zero wakeups, versus one per second with
+    # a sleep-poll keepalive loop. Also lets the coroutine exit cleanly
+    # so bus.disconnect() actually runs at shutdown.
+    stop_event = asyncio.Event()
+    stop_event_out[0] = stop_event
+
     ready_event.set()
 
-    # Keep running until the loop is stopped
     try:
-        while True:
-            await asyncio.sleep(1)
-    except asyncio.CancelledError:
-        pass
+        await stop_event.wait()
     finally:
         bus.disconnect()
@@ -4,15 +4,26 @@
 import os
 import signal
 import subprocess
+import threading
 import time
 
+import pulsectl
+
+
+# wave sampwidth (bytes) -> pw-cat --format name
+_PCM_FORMATS = {1: "u8", 2: "s16", 3: "s24", 4: "s32"}
+
 
 class VirtualMicrophone:
     """A virtual microphone backed by PipeWire's PulseAudio compatibility.
 
-    Creates a null audio sink via pactl. PipeWire auto-creates a .monitor
-    source for the sink. Audio played into the sink (via pw-cat) appears
-    as microphone input on the monitor source.
+    Creates a null audio sink over a persistent libpulse connection
+    (pulsectl). PipeWire auto-creates a .monitor source for the sink.
+    Audio played into the sink (via pw-cat) appears as microphone input
+    on the monitor source.
+
+    One connection serves all module load/unload and default-source
+    operations — previously each was its own pactl fork+exec.
     """
 
     def __init__(self, sink_name="voxkey_test_mic"):
@@ -21,52 +32,33 @@ class VirtualMicrophone:
         self._module_id = None
         self._original_default_source = None
         self._playback_proc = None
+        self._pulse = pulsectl.Pulse("voxkey-test")
         self._cleanup_stale_modules()
         self._create_null_sink()
         self._set_as_default_source()
 
     def _cleanup_stale_modules(self):
         """Unload any leftover null-sink modules from previous test runs."""
-        result = subprocess.run(
-            ["pactl", "list", "modules", "short"],
-            capture_output=True, text=True, timeout=5,
-        )
-        for line in result.stdout.splitlines():
-            parts = line.split("\t")
-            if len(parts) >= 3 and self._sink_name in parts[2]:
-                module_id = parts[0]
-                subprocess.run(
-                    ["pactl", "unload-module", module_id],
-                    capture_output=True, timeout=5,
-                )
+        for module in self._pulse.module_list():
+            if module.argument and self._sink_name in module.argument:
+                self._pulse.module_unload(module.index)
 
     def _create_null_sink(self):
-        """Create a PulseAudio null sink via pactl. PipeWire provides the monitor source."""
-        result = subprocess.run(
-            [
-                "pactl", "load-module", "module-null-sink",
-                f"sink_name={self._sink_name}",
-                f"sink_properties=device.description=VoxkeyTestMic",
-            ],
-            capture_output=True, text=True, timeout=5,
+        """Create a PulseAudio null sink. PipeWire provides the monitor source."""
+        self._module_id = self._pulse.module_load(
+            "module-null-sink",
+            f"sink_name={self._sink_name} "
+            f"sink_properties=device.description=VoxkeyTestMic",
         )
-        module_id = result.stdout.strip()
-        if module_id:
-            self._module_id = module_id
         time.sleep(0.3)
 
     def _set_as_default_source(self):
         """Set the null sink's monitor as the default audio source."""
         # Save original default source for restoration
-        result = subprocess.run(
-            ["pactl", "get-default-source"],
-            capture_output=True, text=True, timeout=5,
-        )
-        self._original_default_source = result.stdout.strip()
+        self._original_default_source = self._pulse.server_info().default_source_name
 
-        subprocess.run(
-            ["pactl", "set-default-source", self._monitor_source],
-            capture_output=True, timeout=5,
+        self._pulse.default_set(
+            self._pulse.get_source_by_name(self._monitor_source),
         )
 
     def stream_file(self, wav_path):
@@ -88,12 +80,59 @@ class VirtualMicrophone:
             stderr=subprocess.PIPE,
         )
 
+    def stream_pcm(self, rate, channels, sampwidth, data):
+        """Stream raw PCM bytes through the virtual microphone.
+
+        Like stream_file, but takes already-decoded samples so callers
+        can cache a fixture in memory and skip the per-call file open
+        and WAV header parse. pw-cat reads the raw stream from stdin; a
+        feeder thread writes the bytes so this returns immediately even
+        though pw-cat consumes at realtime rate.
+        """
+        self._playback_proc = subprocess.Popen(
+            [
+                "pw-cat", "--playback",
+                "--target", self._sink_name,
+                "--raw",
+                "--rate", str(rate),
+                "--channels", str(channels),
+                "--format", _PCM_FORMATS[sampwidth],
+                "-",
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+        def _feed(proc, payload):
+            try:
+                proc.stdin.write(payload)
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass  # Playback was stopped mid-stream
+
+        threading.Thread(
+            target=_feed, args=(self._playback_proc, data), daemon=True,
+        ).start()
+
     def wait_for_playback(self, timeout=30):
         """Wait for the current audio playback to finish."""
         if self._playback_proc:
             self._playback_proc.wait(timeout=timeout)
             self._playback_proc = None
 
+    def wait_for_audio_consumed(self, timeout=30, settle=0.3):
+        """Block until the current playback has been fully consumed.
+
+        pw-cat plays at realtime rate and exits at EOF, so waiting on it
+        holds exactly as long as the fixture audio lasts; the settle
+        covers the tail flushing through the monitor source before the
+        caller releases the shortcut. Replaces fixed hold sleeps sized
+        to the longest fixture.
+        """
+        self.wait_for_playback(timeout=timeout)
+        time.sleep(settle)
+
     def stop_playback(self):
         """Stop any ongoing audio playback."""
         if self._playback_proc:
@@ -109,23 +148,25 @@ class VirtualMicrophone:
         self.stop_playback()
 
         if self._original_default_source:
-            subprocess.run(
-                ["pactl", "set-default-source", self._original_default_source],
-                capture_output=True, timeout=5,
-            )
-
-        if self._module_id:
-            result = subprocess.run(
-                ["pactl", "unload-module", self._module_id],
-                capture_output=True, text=True, timeout=5,
-            )
-            if result.returncode != 0:
+            try:
+                self._pulse.default_set(
+                    self._pulse.get_source_by_name(self._original_default_source),
+                )
+            except pulsectl.PulseError:
+                pass  # Original source may be gone (e.g. device unplugged)
+
+        if self._module_id is not None:
+            try:
+                self._pulse.module_unload(self._module_id)
+            except pulsectl.PulseError as e:
                 import warnings
                 warnings.warn(
-                    f"Failed to unload module {self._module_id}: {result.stderr.strip()}"
+                    f"Failed to unload module {self._module_id}: {e}"
                 )
             self._module_id = None
 
+        self._pulse.close()
+
     def __enter__(self):
         return self
 
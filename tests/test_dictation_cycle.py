@@ -1,40 +1,35 @@
 # ABOUTME: Integration tests for the full dictation cycle from shortcut to text output.
 # ABOUTME: Verifies hold-shortcut, record, transcribe, and inject flow via mock portal.
 
-import os
-import select
+import asyncio
 import time
 
 import pytest
 
+from helpers.daemon_io import assert_alive_for
+from helpers.daemon_io import collect_stderr as _collect_stderr
 from helpers.mock_portal import keysyms_to_text
 
 
-SHORTCUT_HOLD_SECONDS = 3
 TRANSCRIPTION_WAIT_SECONDS = 10
 INJECTION_WAIT_SECONDS = 5
 
 
-def _collect_stderr(proc, timeout=0.5):
-    """Drain available stderr lines from the daemon process."""
-    lines = []
+def _wait_for_keysyms(portal_control, needle, timeout, count=1, poll=0.025):
+    """Poll the keysym log until needle appears count times, or timeout.
+
+    Returns as soon as the daemon has actually injected the text instead
+    of sleeping out the worst-case transcription window. Always returns
+    (True on success) so tests still fall through to their own
+    assertions with the full log.
+    """
     deadline = time.monotonic() + timeout
     while time.monotonic() < deadline:
-        ready = select.select([proc.stderr], [], [], 0.1)[0]
-        if ready:
-            line = proc.stderr.readline()
-            if line:
-                lines.append(line.decode("utf-8", errors="replace").strip())
-            else:
-                break
-    return lines
-
-
-def _assert_daemon_ready(daemon_process):
-    """Assert the daemon reached Idle."""
-    assert daemon_process.reached_idle, (
-        "Daemon did not reach Idle — mock portal setup incomplete"
-    )
+        text = keysyms_to_text(portal_control.get_keysym_log()).lower()
+        if text.count(needle) >= count:
+            return True
+        time.sleep(poll)
+    return False
 
 
 class TestDictationCycle:
@@ -45,24 +40,24 @@ class TestDictationCycle:
     """
 
     def test_single_dictation_cycle(
-        self, daemon_process, portal_control, virtual_mic, fixtures_dir
+        self, daemon_process, portal_control, virtual_mic, wav_cache
     ):
         """Hold shortcut, speak, release, and verify text is injected."""
-        _assert_daemon_ready(daemon_process)
-        wav_path = os.path.join(fixtures_dir, "hello_world.wav")
-
         # Hold the shortcut to start recording
         portal_control.emit_activated()
 
         # Stream pre-recorded audio while shortcut is held
-        virtual_mic.stream_file(wav_path)
-        time.sleep(SHORTCUT_HOLD_SECONDS)
+        virtual_mic.stream_pcm(*wav_cache["hello_world.wav"])
+        virtual_mic.wait_for_audio_consumed()
 
         # Release shortcut to stop recording and trigger transcription
         portal_control.emit_deactivated()
 
         # Wait for transcription and injection to complete
-        time.sleep(TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS)
+        _wait_for_keysyms(
+            portal_control, "hello",
+            TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS,
+        )
 
         captured = keysyms_to_text(portal_control.get_keysym_log())
 
@@ -73,18 +68,19 @@ class TestDictationCycle:
 
     @pytest.mark.xfail(reason="whisper-cpp transcription accuracy varies by model/hardware")
     def test_dictation_produces_correct_transcript(
-        self, daemon_process, portal_control, virtual_mic, fixtures_dir
+        self, daemon_process, portal_control, virtual_mic, wav_cache
     ):
         """The injected text should match the known audio content."""
-        _assert_daemon_ready(daemon_process)
-        wav_path = os.path.join(fixtures_dir, "the_quick_brown_fox.wav")
 
         portal_control.emit_activated()
-        virtual_mic.stream_file(wav_path)
-        time.sleep(SHORTCUT_HOLD_SECONDS)
+        virtual_mic.stream_pcm(*wav_cache["the_quick_brown_fox.wav"])
+        virtual_mic.wait_for_audio_consumed()
         portal_control.emit_deactivated()
 
-        time.sleep(TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS)
+        _wait_for_keysyms(
+            portal_control, "fox",
+            TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS,
+        )
 
         captured = keysyms_to_text(portal_control.get_keysym_log())
 
@@ -99,7 +95,6 @@ class TestDictationCycle:
         self, daemon_process, portal_control
     ):
         """Pressing the shortcut should transition daemon to recording state."""
-        _assert_daemon_ready(daemon_process)
         portal_control.emit_activated()
         time.sleep(1)
 
@@ -113,44 +108,46 @@ class TestDictationCycle:
         assert state_lines, "No state change after shortcut press"
 
     def test_shortcut_release_stops_recording(
-        self, daemon_process, portal_control, virtual_mic, fixtures_dir
+        self, daemon_process, portal_control, virtual_mic, wav_cache
     ):
         """Releasing the shortcut should stop recording and begin transcription."""
-        _assert_daemon_ready(daemon_process)
-        wav_path = os.path.join(fixtures_dir, "hello_world.wav")
 
         portal_control.emit_activated()
-        virtual_mic.stream_file(wav_path)
-        time.sleep(SHORTCUT_HOLD_SECONDS)
+        virtual_mic.stream_pcm(*wav_cache["hello_world.wav"])
+        virtual_mic.wait_for_audio_consumed()
 
         portal_control.emit_deactivated()
-        time.sleep(1)
 
-        # Daemon should still be running after release
-        assert daemon_process.poll() is None, (
-            "Daemon crashed after shortcut release"
+        # Daemon must survive the release; a crash fails immediately
+        # instead of after the full observation window.
+        assert_alive_for(
+            daemon_process, 1, "Daemon crashed after shortcut release",
         )
 
     def test_two_consecutive_dictation_cycles(
-        self, daemon_process, portal_control, virtual_mic, fixtures_dir
+        self, daemon_process, portal_control, virtual_mic, wav_cache
     ):
         """Two back-to-back dictation cycles should both produce text."""
-        _assert_daemon_ready(daemon_process)
-        wav_path = os.path.join(fixtures_dir, "hello_world.wav")
-
         # First cycle
         portal_control.emit_activated()
-        virtual_mic.stream_file(wav_path)
-        time.sleep(SHORTCUT_HOLD_SECONDS)
+        virtual_mic.stream_pcm(*wav_cache["hello_world.wav"])
+        virtual_mic.wait_for_audio_consumed()
         portal_control.emit_deactivated()
-        time.sleep(TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS)
+        _wait_for_keysyms(
+            portal_control, "hello",
+            TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS,
+        )
 
         # Second cycle
         portal_control.emit_activated()
-        virtual_mic.stream_file(wav_path)
-        time.sleep(SHORTCUT_HOLD_SECONDS)
+        virtual_mic.stream_pcm(*wav_cache["hello_world.wav"])
+        virtual_mic.wait_for_audio_consumed()
         portal_control.emit_deactivated()
-        time.sleep(TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS)
+        _wait_for_keysyms(
+            portal_control, "hello",
+            TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS,
+            count=2,
+        )
 
         captured = keysyms_to_text(portal_control.get_keysym_log())
 
@@ -161,29 +158,37 @@ class TestDictationCycle:
             f"in: {captured!r}"
         )
 
-    def test_rapid_repeated_dictation_cycles(
-        self, daemon_process, portal_control, virtual_mic, fixtures_dir
+    @pytest.mark.asyncio
+    async def test_rapid_repeated_dictation_cycles(
+        self, daemon_process, portal_control, virtual_mic, wav_cache
     ):
         """Multiple rapid dictation cycles should not interleave or drop text."""
-        _assert_daemon_ready(daemon_process)
-        wav_path = os.path.join(fixtures_dir, "hello_world.wav")
 
-        # First cycle
-        portal_control.emit_activated()
-        virtual_mic.stream_file(wav_path)
-        time.sleep(2)
-        portal_control.emit_deactivated()
-        time.sleep(TRANSCRIPTION_WAIT_SECONDS)
-
-        for _ in range(2):
+        async def run_cycle():
             portal_control.emit_activated()
-            virtual_mic.stream_file(wav_path)
-            time.sleep(2)
+            virtual_mic.stream_pcm(*wav_cache["hello_world.wav"])
+            await asyncio.to_thread(virtual_mic.wait_for_audio_consumed)
             portal_control.emit_deactivated()
-            time.sleep(TRANSCRIPTION_WAIT_SECONDS)
 
-        # Give final injection time to finish
-        time.sleep(INJECTION_WAIT_SECONDS)
+        def await_transcript(count, timeout=TRANSCRIPTION_WAIT_SECONDS):
+            return asyncio.to_thread(
+                _wait_for_keysyms, portal_control, "hello", timeout, count,
+            )
+
+        # Pipelined: cycle N's audio streams into the mic while cycle
+        # N-1 is still transcribing — the exact overlap the daemon must
+        # tolerate under rapid re-activation, and it cuts the test from
+        # sum(hold + transcribe) toward max(hold, transcribe) per cycle.
+        for cycle in range(3):
+            waits = [run_cycle()]
+            if cycle:
+                waits.append(await_transcript(cycle))
+            await asyncio.gather(*waits)
+
+        # Give final transcription and injection time to finish
+        await await_transcript(
+            3, timeout=TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS,
+        )
 
         captured = keysyms_to_text(portal_control.get_keysym_log())
 
@@ -194,21 +199,22 @@ class TestDictationCycle:
         )
 
     def test_daemon_stays_alive_through_full_cycle(
-        self, daemon_process, portal_control, virtual_mic, fixtures_dir
+        self, daemon_process, portal_control, virtual_mic, wav_cache
     ):
         """The daemon process should remain running throughout a full cycle."""
-        _assert_daemon_ready(daemon_process)
-        wav_path = os.path.join(fixtures_dir, "hello_world.wav")
 
         assert daemon_process.poll() is None, "Daemon not running at start"
 
         portal_control.emit_activated()
-        virtual_mic.stream_file(wav_path)
-        time.sleep(SHORTCUT_HOLD_SECONDS)
+        virtual_mic.stream_pcm(*wav_cache["hello_world.wav"])
+        virtual_mic.wait_for_audio_consumed()
         assert daemon_process.poll() is None, "Daemon died during shortcut hold"
 
         portal_control.emit_deactivated()
-        time.sleep(TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS)
+        _wait_for_keysyms(
+            portal_control, "hello",
+            TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS,
+        )
         assert daemon_process.poll() is None, "Daemon died after shortcut release"
 
     @pytest.mark.xfail(reason="whisper-cpp hallucinates short words on silence")
@@ -216,8 +222,6 @@ class TestDictationCycle:
         self, daemon_process, portal_control, fixtures_dir
     ):
         """Holding the shortcut with silence should produce no injected text."""
-        _assert_daemon_ready(daemon_process)
-
         # Hold and release without streaming audio
         portal_control.emit_activated()
         time.sleep(1)
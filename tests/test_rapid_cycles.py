@@ -1,12 +1,13 @@
 # ABOUTME: Tests that rapid dictation cycling works without losing text or getting confused.
 # ABOUTME: Validates serial injection, queue ordering, and graceful handling of short activations.
 
-import os
 import subprocess
 import time
 
 import pytest
 
+from helpers.daemon_io import wait_for_state
+
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -24,17 +25,21 @@ def _daemon_is_alive(proc):
 
 
 def _perform_dictation_cycle(
-    portal_control, virtual_mic, wav_path, hold_seconds=DICTATION_HOLD_SECONDS
+    portal_control, virtual_mic, utterance, hold_seconds=DICTATION_HOLD_SECONDS
 ):
     """Perform one dictation cycle: activate, stream audio, deactivate.
 
+    `utterance` is a decoded (rate, channels, sampwidth, frames) tuple
+    from the wav_cache fixture, streamed from memory so repeated cycles
+    skip the per-call file open and WAV header parse.
+
     Returns once the shortcut is released. Does not wait for injection
     to finish -- the caller should add appropriate delays.
     """
     portal_control.emit_activated()
     time.sleep(0.1)
 
-    virtual_mic.stream_file(wav_path)
+    virtual_mic.stream_pcm(*utterance)
     time.sleep(hold_seconds)
 
     portal_control.emit_deactivated()
@@ -48,137 +53,84 @@ class TestConsecutiveDictationCycles:
     """Tests that multiple dictation cycles in succession produce correct output."""
 
     def test_five_consecutive_cycles_no_crash(
-        self, daemon_process, portal_control, virtual_mic, fixtures_dir,
+        self, daemon_process, portal_control, virtual_mic, wav_cache,
     ):
         """Five back-to-back dictation cycles should not crash the daemon."""
-        assert daemon_process.reached_idle
 
-        wav_path = os.path.join(fixtures_dir, "test_utterance.wav")
-        if not os.path.exists(wav_path):
-            pytest.skip(f"Test fixture not found: {wav_path}")
+        utterance = wav_cache["test_utterance.wav"]
 
         for cycle in range(5):
             assert _daemon_is_alive(daemon_process), (
                 f"Daemon crashed before cycle {cycle + 1}"
             )
-            _perform_dictation_cycle(portal_control, virtual_mic, wav_path)
-            time.sleep(3)
+            _perform_dictation_cycle(portal_control, virtual_mic, utterance)
+            wait_for_state(daemon_process, "Idle", timeout=20)
 
         assert _daemon_is_alive(daemon_process), (
             "Daemon crashed during consecutive dictation cycles"
         )
 
     def test_no_text_interleaving_between_cycles(
-        self, daemon_process, portal_control, virtual_mic, fixtures_dir,
+        self, daemon_process, portal_control, virtual_mic, wav_cache,
     ):
         """Text from one cycle must finish injecting before the next begins."""
-        assert daemon_process.reached_idle
 
-        wav_path = os.path.join(fixtures_dir, "test_utterance.wav")
-        if not os.path.exists(wav_path):
-            pytest.skip(f"Test fixture not found: {wav_path}")
+        utterance = wav_cache["test_utterance.wav"]
 
         for _ in range(3):
-            _perform_dictation_cycle(portal_control, virtual_mic, wav_path)
-            time.sleep(5)
+            _perform_dictation_cycle(portal_control, virtual_mic, utterance)
+            wait_for_state(daemon_process, "Idle", timeout=20)
 
         assert _daemon_is_alive(daemon_process)
 
 
 # ---------------------------------------------------------------------------
-# Tests: No stuck recording state
+# Tests: Cycle draining (stuck state, queue drain, queue ordering)
 # ---------------------------------------------------------------------------
 
-class TestNoStuckRecording:
-    """Tests that rapid cycling does not leave the daemon in a stuck state."""
-
-    def test_no_stuck_state_after_rapid_cycling(
-        self, daemon_process, portal_control, virtual_mic, fixtures_dir,
-    ):
-        """After rapid cycling, the daemon should return to idle."""
-        assert daemon_process.reached_idle
-
-        wav_path = os.path.join(fixtures_dir, "test_utterance.wav")
-        if not os.path.exists(wav_path):
-            pytest.skip(f"Test fixture not found: {wav_path}")
+class TestCycleDraining:
+    """Rapid cycling must drain fully back to Idle and leave the daemon usable.
 
-        for _ in range(3):
-            _perform_dictation_cycle(
-                portal_control, virtual_mic, wav_path,
-                hold_seconds=0.3,
-            )
-            time.sleep(0.5)
-
-        # Wait for everything to drain
-        time.sleep(10)
-
-        assert _daemon_is_alive(daemon_process), (
-            "Daemon crashed during rapid cycling"
-        )
-
-        # Now try one more normal cycle to prove the daemon is still functional
-        _perform_dictation_cycle(portal_control, virtual_mic, wav_path)
-        time.sleep(5)
-
-        assert _daemon_is_alive(daemon_process), (
-            "Daemon became stuck or crashed after rapid cycling"
-        )
-
-
-# ---------------------------------------------------------------------------
-# Tests: Utterance queue ordering
-# ---------------------------------------------------------------------------
-
-class TestUtteranceQueueOrdering:
-    """Tests that the utterance queue drains completely and in order."""
+    One body covers the stuck-state, queue-drain, and queue-ordering
+    variants, which shared the same spawn/cycle/drain shape and differed
+    only in hold and pause timing; the shared session daemon means no
+    respawn between parameters.
+    """
 
-    def test_queue_drains_completely(
-        self, daemon_process, portal_control, virtual_mic, fixtures_dir,
+    @pytest.mark.parametrize("hold_seconds, pause, drain_timeout", [
+        pytest.param(0.3, 0.5, 20, id="rapid_cycling"),
+        pytest.param(0.4, 0.5, 30, id="queue_drains"),
+        pytest.param(0.5, 1.0, 20, id="queue_ordered"),
+    ])
+    def test_cycles_drain_and_daemon_stays_usable(
+        self, daemon_process, portal_control, virtual_mic, wav_cache,
+        hold_seconds, pause, drain_timeout,
     ):
-        """All enqueued utterances must eventually be injected."""
-        assert daemon_process.reached_idle
-
-        wav_path = os.path.join(fixtures_dir, "test_utterance.wav")
-        if not os.path.exists(wav_path):
-            pytest.skip(f"Test fixture not found: {wav_path}")
+        """All enqueued utterances drain, in order, without wedging the daemon."""
 
-        cycle_count = 3
-        for _ in range(cycle_count):
+        utterance = wav_cache["test_utterance.wav"]
+        cycles = 3
+        for _ in range(cycles):
             _perform_dictation_cycle(
-                portal_control, virtual_mic, wav_path,
-                hold_seconds=0.4,
+                portal_control, virtual_mic, utterance,
+                hold_seconds=hold_seconds,
             )
-            time.sleep(0.5)
+            time.sleep(pause)
 
-        # Wait generously for all transcriptions and injections
-        time.sleep(cycle_count * 10)
+        # Every queued transcription and injection must finish
+        wait_for_state(daemon_process, "Idle", timeout=drain_timeout,
+                       count=cycles)
 
         assert _daemon_is_alive(daemon_process), (
-            "Daemon crashed while draining utterance queue"
+            "Daemon crashed while draining dictation cycles"
         )
 
-    def test_queue_preserves_order(
-        self, daemon_process, portal_control, virtual_mic, fixtures_dir,
-    ):
-        """Utterances must be injected in the order they were recorded."""
-        assert daemon_process.reached_idle
-
-        wav_path = os.path.join(fixtures_dir, "test_utterance.wav")
-        if not os.path.exists(wav_path):
-            pytest.skip(f"Test fixture not found: {wav_path}")
-
-        for _ in range(3):
-            _perform_dictation_cycle(
-                portal_control, virtual_mic, wav_path,
-                hold_seconds=0.5,
-            )
-            time.sleep(1)
-
-        # Let everything drain
-        time.sleep(20)
+        # One more normal cycle proves nothing is stuck
+        _perform_dictation_cycle(portal_control, virtual_mic, utterance)
+        wait_for_state(daemon_process, "Idle", timeout=20)
 
         assert _daemon_is_alive(daemon_process), (
-            "Daemon crashed while processing ordered utterances"
+            "Daemon became stuck or crashed after rapid cycling"
         )
 
 
@@ -193,13 +145,12 @@ class TestRapidActivateDeactivate:
         self, daemon_process, portal_control,
     ):
         """Activate and immediately deactivate the shortcut."""
-        assert daemon_process.reached_idle
         assert _daemon_is_alive(daemon_process)
 
         portal_control.emit_activated()
         time.sleep(0.02)
         portal_control.emit_deactivated()
-        time.sleep(2)
+        wait_for_state(daemon_process, "Idle", timeout=2)
 
         assert _daemon_is_alive(daemon_process), (
             "Daemon crashed on instant press-release"
@@ -209,7 +160,6 @@ class TestRapidActivateDeactivate:
         self, daemon_process, portal_control,
     ):
         """Rapidly tapping the shortcut many times should not crash."""
-        assert daemon_process.reached_idle
         assert _daemon_is_alive(daemon_process)
 
         for i in range(10):
@@ -218,17 +168,16 @@ class TestRapidActivateDeactivate:
             portal_control.emit_deactivated()
             time.sleep(0.1)
 
-        time.sleep(5)
+        wait_for_state(daemon_process, "Idle", timeout=5)
 
         assert _daemon_is_alive(daemon_process), (
             "Daemon crashed after 10 rapid taps"
         )
 
     def test_daemon_still_functional_after_rapid_taps(
-        self, daemon_process, portal_control, virtual_mic, fixtures_dir,
+        self, daemon_process, portal_control, virtual_mic, wav_cache,
     ):
         """After rapid taps, a normal dictation cycle should still work."""
-        assert daemon_process.reached_idle
         assert _daemon_is_alive(daemon_process)
 
         # Fire off some rapid taps
@@ -238,15 +187,13 @@ class TestRapidActivateDeactivate:
             portal_control.emit_deactivated()
             time.sleep(0.1)
 
-        time.sleep(3)
+        wait_for_state(daemon_process, "Idle", timeout=3)
 
         # Now do a normal dictation cycle
-        wav_path = os.path.join(fixtures_dir, "test_utterance.wav")
-        if not os.path.exists(wav_path):
-            pytest.skip(f"Test fixture not found: {wav_path}")
+        utterance = wav_cache["test_utterance.wav"]
 
-        _perform_dictation_cycle(portal_control, virtual_mic, wav_path)
-        time.sleep(5)
+        _perform_dictation_cycle(portal_control, virtual_mic, utterance)
+        wait_for_state(daemon_process, "Idle", timeout=20)
 
         assert _daemon_is_alive(daemon_process), (
             "Daemon crashed during normal cycle after rapid taps"
@@ -261,47 +208,41 @@ class TestOverlappingDictation:
     """Tests starting a new dictation while the previous injection is ongoing."""
 
     def test_new_dictation_during_injection_does_not_crash(
-        self, daemon_process, portal_control, virtual_mic, fixtures_dir,
+        self, daemon_process, portal_control, virtual_mic, wav_cache,
     ):
         """Start a second dictation while the first is still being injected."""
-        assert daemon_process.reached_idle
 
-        wav_path = os.path.join(fixtures_dir, "test_utterance.wav")
-        if not os.path.exists(wav_path):
-            pytest.skip(f"Test fixture not found: {wav_path}")
+        utterance = wav_cache["test_utterance.wav"]
 
         # First dictation cycle -- don't wait for injection to finish
-        _perform_dictation_cycle(portal_control, virtual_mic, wav_path)
+        _perform_dictation_cycle(portal_control, virtual_mic, utterance)
         # Start the second cycle immediately
         time.sleep(0.3)
-        _perform_dictation_cycle(portal_control, virtual_mic, wav_path)
+        _perform_dictation_cycle(portal_control, virtual_mic, utterance)
 
         # Wait for both to complete
-        time.sleep(15)
+        wait_for_state(daemon_process, "Idle", timeout=15, count=2)
 
         assert _daemon_is_alive(daemon_process), (
             "Daemon crashed during overlapping dictation cycles"
         )
 
     def test_three_overlapping_cycles_no_crash(
-        self, daemon_process, portal_control, virtual_mic, fixtures_dir,
+        self, daemon_process, portal_control, virtual_mic, wav_cache,
     ):
         """Three rapid overlapping cycles should all be queued safely."""
-        assert daemon_process.reached_idle
 
-        wav_path = os.path.join(fixtures_dir, "test_utterance.wav")
-        if not os.path.exists(wav_path):
-            pytest.skip(f"Test fixture not found: {wav_path}")
+        utterance = wav_cache["test_utterance.wav"]
 
         for _ in range(3):
             _perform_dictation_cycle(
-                portal_control, virtual_mic, wav_path,
+                portal_control, virtual_mic, utterance,
                 hold_seconds=0.3,
             )
             time.sleep(0.2)
 
         # Wait for all injections to drain
-        time.sleep(20)
+        wait_for_state(daemon_process, "Idle", timeout=20, count=3)
 
         assert _daemon_is_alive(daemon_process), (
             "Daemon crashed during three overlapping dictation cycles"
@@ -2,60 +2,94 @@
 # ABOUTME: Validates session creation, device selection, session start, and keystroke injection.
 
 import asyncio
-import uuid
+import secrets
 
 import pytest
 import pytest_asyncio
-from dbus_next import Variant
+from dbus_fast import Variant
 
 from helpers.dbus_portal import (
     REMOTE_DESKTOP_IFACE,
     PORTAL_BUS_NAME,
     KEYBOARD_DEVICE_BIT,
     has_keyboard_support,
+    arm_portal_response,
     await_portal_response,
     close_portal_session,
     safe_introspect,
 )
 
 
-def _handle_token():
-    """Generate a unique handle_token for portal requests."""
-    return "voxkey_test_" + uuid.uuid4().hex[:8]
+# D-Bus sender names become object-path elements with '.' -> '_' and ':'
+# stripped; built once for the pool below.
+_SENDER_SANITIZE = str.maketrans({".": "_", ":": None})
 
 
-async def _await_response(bus, sender_name, request_path, timeout=10):
-    """Wait for the portal Response signal on a request path."""
-    return await await_portal_response(bus, request_path, timeout=timeout)
+class _TokenPool:
+    """Amortized handle tokens and request paths for one bus connection.
 
+    uuid4 costs a getrandom syscall per token, and the request-path
+    prefix repeated two str.replace passes over the bus name per call.
+    One pool draws 8-hex-char tokens from a single secrets.token_hex
+    batch and builds the sanitized sender prefix once.
+    """
 
-def _make_request_path(bus, token):
-    """Build the expected portal request object path."""
-    sender = bus.unique_name.replace(".", "_").replace(":", "")
-    return f"/org/freedesktop/portal/desktop/request/{sender}/{token}"
+    def __init__(self, bus):
+        self._entropy = secrets.token_hex(512)
+        self._i = 0
+        sender = bus.unique_name.translate(_SENDER_SANITIZE)
+        self._prefix = f"/org/freedesktop/portal/desktop/request/{sender}/"
+
+    def next(self):
+        """Return (handle_token, request_path) for a fresh token."""
+        i = self._i
+        if i + 8 > len(self._entropy):
+            self._entropy = secrets.token_hex(512)
+            i = 0
+        self._i = i + 8
+        token = "voxkey_test_" + self._entropy[i:i + 8]
+        return token, self._prefix + token
+
+
+# bus -> _TokenPool. MessageBus defines __slots__, so the pool lives in a
+# side table (same pattern as the dbus_portal caches).
+_TOKEN_POOLS = {}
+
+
+def _token_pool(bus):
+    """The bus's token pool, created on first use."""
+    pool = _TOKEN_POOLS.get(bus)
+    if pool is None:
+        pool = _TOKEN_POOLS[bus] = _TokenPool(bus)
+    return pool
+
+
+async def _portal_call(bus, method, *args, extra_options=None):
+    """Invoke a portal request method with its Response pre-armed.
+
+    The Response slot is registered synchronously before the method call
+    goes out, so no settle sleep is needed between subscribing and
+    invoking. Returns (response_code, results).
+    """
+    token, request_path = _token_pool(bus).next()
+    options = {"handle_token": Variant("s", token)}
+    if extra_options:
+        options.update(extra_options)
+
+    arm_portal_response(bus, request_path)
+    await method(*args, options)
+    return await await_portal_response(bus, request_path)
 
 
 async def _create_rd_session(bus, portal_proxy):
     """Create a RemoteDesktop session and return the session handle."""
     rd = portal_proxy.get_interface(REMOTE_DESKTOP_IFACE)
+    session_token = _token_pool(bus).next()[0]
 
-    token = _handle_token()
-    session_token = _handle_token()
-    request_path = _make_request_path(bus, token)
-
-    response_task = asyncio.ensure_future(
-        _await_response(bus, PORTAL_BUS_NAME, request_path)
+    response_code, results = await _portal_call(
+        bus, rd.call_create_session,
+        extra_options={"session_handle_token": Variant("s", session_token)},
     )
-    await asyncio.sleep(0.05)
-
-    await rd.call_create_session(
-        {
-            "handle_token": Variant("s", token),
-            "session_handle_token": Variant("s", session_token),
-        }
-    )
-
-    response_code, results = await response_task
     assert response_code == 0, f"CreateSession failed with response {response_code}"
 
     return results.get("session_handle", Variant("s", "")).value
@@ -65,24 +99,13 @@ async def _select_keyboard(bus, portal_proxy, session_handle):
     """Call SelectDevices requesting keyboard access."""
     rd = portal_proxy.get_interface(REMOTE_DESKTOP_IFACE)
 
-    token = _handle_token()
-    request_path = _make_request_path(bus, token)
-
-    response_task = asyncio.ensure_future(
-        _await_response(bus, PORTAL_BUS_NAME, request_path)
-    )
-    await asyncio.sleep(0.05)
-
-    await rd.call_select_devices(
-        session_handle,
-        {
-            "handle_token": Variant("s", token),
+    response_code, results = await _portal_call(
+        bus, rd.call_select_devices, session_handle,
+        extra_options={
             "types": Variant("u", KEYBOARD_DEVICE_BIT),
             "persist_mode": Variant("u", 0),
         },
     )
-
-    response_code, results = await response_task
     assert response_code == 0, f"SelectDevices failed with response {response_code}"
     return results
 
@@ -91,21 +114,9 @@ async def _start_session(bus, portal_proxy, session_handle):
     """Call Start on a RemoteDesktop session and return the results."""
     rd = portal_proxy.get_interface(REMOTE_DESKTOP_IFACE)
 
-    token = _handle_token()
-    request_path = _make_request_path(bus, token)
-
-    response_task = asyncio.ensure_future(
-        _await_response(bus, PORTAL_BUS_NAME, request_path)
+    response_code, results = await _portal_call(
+        bus, rd.call_start, session_handle, "",
     )
-    await asyncio.sleep(0.05)
-
-    await rd.call_start(
-        session_handle,
-        "",
-        {"handle_token": Variant("s", token)},
-    )
-
-    response_code, results = await response_task
     assert response_code == 0, f"Start failed with response {response_code}"
     return results
 
@@ -115,6 +126,22 @@ async def _close_session(bus, session_handle):
     await close_portal_session(bus, session_handle)
 
 
+@pytest_asyncio.fixture(scope="session")
+async def rd_session(dbus_session, portal_proxy):
+    """One created, selected, and started session shared by the read-only tests.
+
+    The create -> select -> start calls have data dependencies and stay
+    ordered, but running them once per file instead of per test cuts
+    three CreateSession round-trips (each a method reply plus a Response
+    signal) to one. Tests that close their session build a private one.
+    """
+    session_handle = await _create_rd_session(dbus_session, portal_proxy)
+    select_results = await _select_keyboard(dbus_session, portal_proxy, session_handle)
+    start_results = await _start_session(dbus_session, portal_proxy, session_handle)
+    yield session_handle, select_results, start_results
+    await _close_session(dbus_session, session_handle)
+
+
 @pytest.mark.asyncio
 async def test_create_remote_desktop_session(dbus_session, portal_proxy):
     """Creating a RemoteDesktop session should succeed and return a valid handle."""
@@ -126,59 +153,39 @@ async def test_create_remote_desktop_session(dbus_session, portal_proxy):
 
 
 @pytest.mark.asyncio
-async def test_select_keyboard_device(dbus_session, portal_proxy):
+async def test_select_keyboard_device(rd_session):
     """SelectDevices with keyboard type should succeed."""
-    session_handle = await _create_rd_session(dbus_session, portal_proxy)
-
-    results = await _select_keyboard(dbus_session, portal_proxy, session_handle)
+    _, select_results, _ = rd_session
     # SelectDevices response is typically empty on success (code 0 is enough)
-    assert results is not None
-
-    await _close_session(dbus_session, session_handle)
+    assert select_results is not None
 
 
 @pytest.mark.asyncio
-async def test_start_session_grants_keyboard(dbus_session, portal_proxy):
+async def test_start_session_grants_keyboard(rd_session):
     """Starting a session after selecting keyboard should include keyboard in devices."""
-    session_handle = await _create_rd_session(dbus_session, portal_proxy)
-    await _select_keyboard(dbus_session, portal_proxy, session_handle)
+    _, _, start_results = rd_session
 
-    results = await _start_session(dbus_session, portal_proxy, session_handle)
-
-    devices = results.get("devices", Variant("u", 0)).value
+    devices = start_results.get("devices", Variant("u", 0)).value
     assert has_keyboard_support(devices), (
         f"Keyboard bit not set in Start result devices: {devices}"
     )
 
-    await _close_session(dbus_session, session_handle)
-
 
 @pytest.mark.asyncio
-async def test_notify_keyboard_keysym(dbus_session, portal_proxy):
+async def test_notify_keyboard_keysym(portal_proxy, rd_session):
     """NotifyKeyboardKeysym should send a keystroke without error."""
-    session_handle = await _create_rd_session(dbus_session, portal_proxy)
-    await _select_keyboard(dbus_session, portal_proxy, session_handle)
-    await _start_session(dbus_session, portal_proxy, session_handle)
+    session_handle, _, _ = rd_session
 
     rd = portal_proxy.get_interface(REMOTE_DESKTOP_IFACE)
 
-    # Send 'a' keysym (0x61) -- press then release
+    # Send 'a' keysym (0x61) -- press then release. The two calls are
+    # independent method calls that need no ordered ack, so overlap
+    # their round-trips.
     XKB_KEY_a = 0x61
-    try:
-        await rd.call_notify_keyboard_keysym(
-            session_handle,
-            {},
-            XKB_KEY_a,
-            1,  # pressed
-        )
-        await rd.call_notify_keyboard_keysym(
-            session_handle,
-            {},
-            XKB_KEY_a,
-            0,  # released
-        )
-    finally:
-        await _close_session(dbus_session, session_handle)
+    await asyncio.gather(
+        rd.call_notify_keyboard_keysym(session_handle, {}, XKB_KEY_a, 1),
+        rd.call_notify_keyboard_keysym(session_handle, {}, XKB_KEY_a, 0),
+    )
 
 
 @pytest.mark.asyncio
@@ -6,15 +6,17 @@ import uuid
 
 import pytest
 import pytest_asyncio
-from dbus_next import Variant
+from dbus_fast import Variant
 
 from helpers.dbus_portal import (
     GLOBAL_SHORTCUTS_IFACE,
     PORTAL_BUS_NAME,
     has_interface,
+    arm_portal_response,
     await_portal_response,
     close_portal_session,
     safe_introspect,
+    sync_bus,
 )
 
 
@@ -23,32 +25,32 @@ def _handle_token():
     return "voxkey_test_" + uuid.uuid4().hex[:8]
 
 
-async def _await_response(bus, sender_name, request_path, timeout=10):
-    """Wait for the portal Response signal on a request path."""
-    return await await_portal_response(bus, request_path, timeout=timeout)
-
-
 def _make_request_path(bus, token):
     """Build the expected portal request object path."""
     sender = bus.unique_name.replace(".", "_").replace(":", "")
     return f"/org/freedesktop/portal/desktop/request/{sender}/{token}"
 
 
-async def _create_shortcuts_session(bus, portal_proxy):
-    """Create a GlobalShortcuts session and return the session handle."""
-    gs = portal_proxy.get_interface(GLOBAL_SHORTCUTS_IFACE)
+@pytest_asyncio.fixture(scope="session")
+async def gs_iface(portal_proxy):
+    """The resolved GlobalShortcuts interface, looked up once per session.
+
+    Every helper and signal test needs this interface; resolving it here
+    replaces a get_interface dispatch per call with a fixture lookup.
+    """
+    return portal_proxy.get_interface(GLOBAL_SHORTCUTS_IFACE)
 
+
+async def _create_shortcuts_session(bus, gs):
+    """Create a GlobalShortcuts session and return the session handle."""
     token = _handle_token()
     session_token = _handle_token()
 
     request_path = _make_request_path(bus, token)
 
-    # Subscribe to the response before making the call
-    response_task = asyncio.ensure_future(
-        _await_response(bus, PORTAL_BUS_NAME, request_path)
-    )
-    # Small yield so the subscription is active
-    await asyncio.sleep(0.05)
+    # Arm the Response slot before making the call; arming is synchronous,
+    # so no settle sleep is needed for the subscription to be active.
+    arm_portal_response(bus, request_path)
 
     await gs.call_create_session(
         {
@@ -57,7 +59,7 @@ async def _create_shortcuts_session(bus, portal_proxy):
         }
     )
 
-    response_code, results = await response_task
+    response_code, results = await await_portal_response(bus, request_path)
     assert response_code == 0, f"CreateSession failed with response {response_code}"
 
     return results.get("session_handle", Variant("s", "")).value
@@ -68,20 +70,36 @@ async def _close_session(bus, session_handle):
     await close_portal_session(bus, session_handle)
 
 
+@pytest_asyncio.fixture(scope="module")
+async def shortcuts_session(dbus_session, gs_iface):
+    """One created-and-bound GlobalShortcuts session shared by this module.
+
+    BindShortcuts may only run once per session, so the bind happens here
+    and its results are shared along with the handle. Cuts the per-test
+    CreateSession + BindShortcuts + Close round-trips down to one set for
+    the module; tests that close their session or re-bind build a
+    private one.
+    """
+    session_handle = await _create_shortcuts_session(dbus_session, gs_iface)
+    bind_code, bind_results = await _bind_dictate_shortcut(
+        dbus_session, gs_iface, session_handle,
+    )
+    yield session_handle, bind_code, bind_results
+    await _close_session(dbus_session, session_handle)
+
+
 @pytest.mark.asyncio
-async def test_create_global_shortcuts_session(dbus_session, portal_proxy):
+async def test_create_global_shortcuts_session(dbus_session, gs_iface):
     """Creating a GlobalShortcuts session should succeed and return a session handle."""
-    session_handle = await _create_shortcuts_session(dbus_session, portal_proxy)
+    session_handle = await _create_shortcuts_session(dbus_session, gs_iface)
     assert session_handle, "Session handle must not be empty"
     assert session_handle.startswith("/org/freedesktop/portal/desktop/session/")
 
     await _close_session(dbus_session, session_handle)
 
 
-async def _bind_dictate_shortcut(bus, portal_proxy, session_handle):
+async def _bind_dictate_shortcut(bus, gs, session_handle, timeout=10):
     """Bind the dictate_hold shortcut. Returns (response_code, results)."""
-    gs = portal_proxy.get_interface(GLOBAL_SHORTCUTS_IFACE)
-
     token = _handle_token()
     request_path = _make_request_path(bus, token)
 
@@ -92,10 +110,7 @@ async def _bind_dictate_shortcut(bus, portal_proxy, session_handle):
         }],
     ]
 
-    response_task = asyncio.ensure_future(
-        _await_response(bus, PORTAL_BUS_NAME, request_path)
-    )
-    await asyncio.sleep(0.05)
+    arm_portal_response(bus, request_path)
 
     await gs.call_bind_shortcuts(
         session_handle,
@@ -104,17 +119,13 @@ async def _bind_dictate_shortcut(bus, portal_proxy, session_handle):
         {"handle_token": Variant("s", token)},
     )
 
-    return await response_task
+    return await await_portal_response(bus, request_path, timeout=timeout)
 
 
 @pytest.mark.asyncio
-async def test_bind_shortcut(dbus_session, portal_proxy):
+async def test_bind_shortcut(shortcuts_session):
     """Binding a shortcut to a session should succeed."""
-    session_handle = await _create_shortcuts_session(dbus_session, portal_proxy)
-
-    response_code, results = await _bind_dictate_shortcut(
-        dbus_session, portal_proxy, session_handle,
-    )
+    _, response_code, results = shortcuts_session
 
     assert response_code == 0, (
         f"BindShortcuts failed with response {response_code}"
@@ -127,79 +138,56 @@ async def test_bind_shortcut(dbus_session, portal_proxy):
         f"'dictate_hold' not in bound shortcuts: {shortcut_ids}"
     )
 
-    await _close_session(dbus_session, session_handle)
-
 
 @pytest.mark.asyncio
-async def test_shortcut_activated_signal(dbus_session, portal_proxy, portal_control):
-    """Emitting an Activated signal should be received by the signal listener."""
-    session_handle = await _create_shortcuts_session(dbus_session, portal_proxy)
-    gs = portal_proxy.get_interface(GLOBAL_SHORTCUTS_IFACE)
-
-    response_code, _ = await _bind_dictate_shortcut(
-        dbus_session, portal_proxy, session_handle,
-    )
+@pytest.mark.parametrize("handler_attr, emit_attr", [
+    pytest.param("on_activated", "emit_activated", id="activated"),
+    pytest.param("on_deactivated", "emit_deactivated", id="deactivated"),
+])
+async def test_shortcut_signal_received(
+    dbus_session, shortcuts_session, gs_iface, portal_control,
+    handler_attr, emit_attr,
+):
+    """Emitting a shortcut signal should be received by the signal listener.
+
+    The Activated and Deactivated cases were byte-for-byte identical up
+    to the signal name; one body covers both against the shared bound
+    session, so the second case only pays for its own signal wait.
+    """
+    _, response_code, _ = shortcuts_session
     assert response_code == 0, f"BindShortcuts failed (response={response_code})"
 
-    # Listen for Activated signal
     loop = asyncio.get_event_loop()
-    activated = loop.create_future()
+    received = loop.create_future()
 
-    def _on_activated(sess_handle, shortcut_id, timestamp, options):
-        if shortcut_id == "dictate_hold" and not activated.done():
-            activated.set_result((shortcut_id, timestamp))
+    def _on_signal(sess_handle, shortcut_id, timestamp, options):
+        if shortcut_id == "dictate_hold" and not received.done():
+            received.set_result((shortcut_id, timestamp))
 
-    gs.on_activated(_on_activated)
-    # Allow time for the match rule to reach the dbus-daemon
-    await asyncio.sleep(0.3)
+    getattr(gs_iface, handler_attr)(_on_signal)
+    # The registration queued an AddMatch on our connection; one
+    # round-trip confirms the dbus-daemon has applied it.
+    await sync_bus(dbus_session)
 
-    # Emit Activated via the mock portal controller
-    portal_control.emit_activated("dictate_hold")
+    # Emit the signal via the mock portal controller
+    getattr(portal_control, emit_attr)("dictate_hold")
 
-    try:
-        shortcut_id, timestamp = await asyncio.wait_for(activated, timeout=5)
-        assert shortcut_id == "dictate_hold"
-    finally:
-        await _close_session(dbus_session, session_handle)
+    async with asyncio.timeout(5):
+        shortcut_id, timestamp = await received
+    assert shortcut_id == "dictate_hold"
 
-
-@pytest.mark.asyncio
-async def test_shortcut_deactivated_signal(dbus_session, portal_proxy, portal_control):
-    """Emitting a Deactivated signal should be received by the signal listener."""
-    session_handle = await _create_shortcuts_session(dbus_session, portal_proxy)
-    gs = portal_proxy.get_interface(GLOBAL_SHORTCUTS_IFACE)
-
-    response_code, _ = await _bind_dictate_shortcut(
-        dbus_session, portal_proxy, session_handle,
-    )
-    assert response_code == 0, f"BindShortcuts failed (response={response_code})"
-
-    # Listen for Deactivated signal
-    loop = asyncio.get_event_loop()
-    deactivated = loop.create_future()
-
-    def _on_deactivated(sess_handle, shortcut_id, timestamp, options):
-        if shortcut_id == "dictate_hold" and not deactivated.done():
-            deactivated.set_result((shortcut_id, timestamp))
-
-    gs.on_deactivated(_on_deactivated)
-    # Allow time for the match rule to reach the dbus-daemon
-    await asyncio.sleep(0.3)
-
-    # Emit Deactivated via the mock portal controller
-    portal_control.emit_deactivated("dictate_hold")
-
-    try:
-        shortcut_id, timestamp = await asyncio.wait_for(deactivated, timeout=5)
-        assert shortcut_id == "dictate_hold"
-    finally:
-        await _close_session(dbus_session, session_handle)
+    # The mock portal emits to every registered session — including the
+    # shared daemon's when another file has spawned it — so a lone
+    # Activated would leave that daemon recording until some later test
+    # happens to release it. Always pair the press with a release.
+    if emit_attr == "emit_activated":
+        portal_control.emit_deactivated("dictate_hold")
 
 
 @pytest.mark.asyncio
-async def test_session_cleanup(dbus_session, portal_proxy):
+async def test_session_cleanup(dbus_session, gs_iface):
     """Closing a session should succeed without error."""
-    session_handle = await _create_shortcuts_session(dbus_session, portal_proxy)
+    session_handle = await _create_shortcuts_session(dbus_session, gs_iface)
     assert session_handle
 
     # Closing should not raise
@@ -218,23 +206,25 @@ async def test_session_cleanup(dbus_session, portal_proxy):
 
 
 @pytest.mark.asyncio
-async def test_duplicate_bind_fails_gracefully(dbus_session, portal_proxy):
+async def test_duplicate_bind_fails_gracefully(dbus_session, gs_iface):
     """A second BindShortcuts on the same session should fail or be rejected."""
-    session_handle = await _create_shortcuts_session(dbus_session, portal_proxy)
+    session_handle = await _create_shortcuts_session(dbus_session, gs_iface)
 
     # First bind
     code1, _ = await _bind_dictate_shortcut(
-        dbus_session, portal_proxy, session_handle,
+        dbus_session, gs_iface, session_handle,
     )
     assert code1 == 0, f"First BindShortcuts failed (response={code1})"
 
     # Second bind on the same session -- per the spec, BindShortcuts can only
     # be attempted once per session. The portal should return a non-zero
-    # response or raise an error.
+    # response or raise an error. The rejection Response is emitted inline
+    # with the method reply, so a short timeout suffices; a portal that
+    # leaves the request dangling then fails in ~1 s instead of 10 s.
     second_bind_rejected = False
     try:
         code2, _ = await _bind_dictate_shortcut(
-            dbus_session, portal_proxy, session_handle,
+            dbus_session, gs_iface, session_handle, timeout=1,
         )
         second_bind_rejected = code2 != 0
     except Exception:
@@ -1,51 +1,26 @@
 # ABOUTME: Tests that the voxkey daemon state machine handles transitions correctly.
 # ABOUTME: Validates edge cases like duplicate signals, rapid cycling, and error recovery.
 
-import time
+import re
 
-import pytest
+from helpers.daemon_io import collect_stderr as _collect_stderr
+from helpers.daemon_io import collect_until_quiet as _collect_until_quiet
+from helpers.daemon_io import wait_for_state as _wait_for_state
 
 
-# ---------------------------------------------------------------------------
-# Helpers
-# ---------------------------------------------------------------------------
+# Compiled once: extracts the state name from a 'STATE: <name>' log line
+# in a single C-level pass instead of an `in` scan plus split per line.
+_STATE_RE = re.compile(r"STATE:\s*(\S+)")
+
 
-def _collect_stderr(proc, timeout=0.5):
-    """Drain available stderr lines from the daemon process."""
-    import select
-    lines = []
-    deadline = time.monotonic() + timeout
-    while time.monotonic() < deadline:
-        ready = select.select([proc.stderr], [], [], 0.1)[0]
-        if ready:
-            line = proc.stderr.readline()
-            if line:
-                lines.append(line.decode("utf-8", errors="replace").strip())
-            else:
-                break
-    return lines
-
-
-def _wait_for_state(proc, target_state, timeout=30):
-    """Poll daemon stderr until target_state appears or timeout.
-
-    Returns (found, collected_lines).
-    """
-    import select
-    lines = []
-    deadline = time.monotonic() + timeout
-    while time.monotonic() < deadline:
-        if proc.poll() is not None:
-            break
-        ready = select.select([proc.stderr], [], [], 0.5)[0]
-        if ready:
-            line = proc.stderr.readline()
-            if line:
-                decoded = line.decode("utf-8", errors="replace").strip()
-                lines.append(decoded)
-                if "STATE:" in decoded and target_state in decoded.split("STATE:")[-1]:
-                    return True, lines
-    return False, lines
+def _states_in(lines):
+    """Extract the sequence of state names logged in `lines`."""
+    states = []
+    for line in lines:
+        m = _STATE_RE.search(line)
+        if m:
+            states.append(m.group(1))
+    return states
 
 
 # ---------------------------------------------------------------------------
@@ -59,10 +34,6 @@ class TestIdleToRecording:
         self, daemon_process, portal_control
     ):
         """When the daemon is Idle, an Activated signal should start recording."""
-        assert daemon_process.reached_idle, (
-            "Daemon did not reach Idle — mock portal setup incomplete"
-        )
-
         # Simulate pressing the global shortcut
         portal_control.emit_activated()
 
@@ -85,10 +56,6 @@ class TestFullDictationCycle:
         """A complete hold-release cycle should pass through all states back to Idle."""
         import os
 
-        assert daemon_process.reached_idle, (
-            "Daemon did not reach Idle — mock portal setup incomplete"
-        )
-
         audio_file = os.path.join(fixtures_dir, "hello.wav")
 
         # Start the virtual mic streaming audio
@@ -100,18 +67,16 @@ class TestFullDictationCycle:
         found, lines = _wait_for_state(daemon_process, "Recording", timeout=10)
         assert found, f"Did not reach Recording state: {lines}"
 
-        # Hold for a moment to capture audio, then release
-        time.sleep(1.5)
+        # Hold until the fixture audio has fully played, then release
+        virtual_mic.wait_for_audio_consumed()
         portal_control.emit_deactivated()
 
         # Poll until we return to Idle (transcription + injection)
         found_idle, more_lines = _wait_for_state(daemon_process, "Idle", timeout=60)
         all_lines = lines + more_lines
 
-        state_lines = [l for l in all_lines if "STATE:" in l]
         states_seen = []
-        for l in state_lines:
-            state = l.split("STATE:")[-1].strip()
+        for state in _states_in(all_lines):
             if not states_seen or states_seen[-1] != state:
                 states_seen.append(state)
 
@@ -129,26 +94,19 @@ class TestDuplicateActivatedIgnored:
         self, daemon_process, portal_control
     ):
         """A second Activated while Recording should not start a second recording."""
-        assert daemon_process.reached_idle, (
-            "Daemon did not reach Idle — mock portal setup incomplete"
-        )
-
         # First activation -> Recording
         portal_control.emit_activated()
 
         found, initial_lines = _wait_for_state(daemon_process, "Recording", timeout=10)
         assert found, "First Activated did not produce Recording state"
 
-        # Simulate another activation while already recording
+        # Simulate another activation while already recording, then check
+        # that we didn't get another Recording transition. The collect
+        # returns once stderr goes quiet, so the usual no-reaction case
+        # doesn't pay the full one-second ceiling.
         portal_control.emit_activated()
-        time.sleep(1.0)
-
-        # Check that we didn't get another Recording transition
-        extra_lines = _collect_stderr(daemon_process, timeout=1.0)
-        recording_count_after = sum(
-            1 for l in extra_lines
-            if "STATE:" in l and "Recording" in l.split("STATE:")[-1]
-        )
+        extra_lines = _collect_until_quiet(daemon_process, quiet=0.3, timeout=1.0)
+        recording_count_after = _states_in(extra_lines).count("Recording")
 
         assert recording_count_after == 0, (
             f"Duplicate Activated caused extra Recording transitions: {extra_lines}"
@@ -165,20 +123,16 @@ class TestDuplicateDeactivatedIgnored:
         self, daemon_process, portal_control
     ):
         """Releasing the shortcut while Idle should not cause errors or state changes."""
-        assert daemon_process.reached_idle, (
-            "Daemon did not reach Idle — mock portal setup incomplete"
-        )
-
         # Drain initial startup logs
         _collect_stderr(daemon_process)
 
-        # Send a release without ever pressing (daemon should be Idle)
+        # Send a release without ever pressing (daemon should be Idle);
+        # collect whatever reaction it logs, returning early once stderr
+        # goes quiet.
         portal_control.emit_deactivated()
-        time.sleep(0.5)
-
-        lines = _collect_stderr(daemon_process)
+        lines = _collect_until_quiet(daemon_process, quiet=0.3, timeout=1.0)
         # Should not see any state transitions or errors
-        state_changes = [l for l in lines if "STATE:" in l]
+        state_changes = _states_in(lines)
         error_lines = [l for l in lines if "ERROR" in l.upper()]
 
         assert len(state_changes) == 0, (
@@ -198,10 +152,6 @@ class TestSerialInjectionQueue:
         """Two dictation cycles should inject text one after the other, never concurrently."""
         import os
 
-        assert daemon_process.reached_idle, (
-            "Daemon did not reach Idle — mock portal setup incomplete"
-        )
-
         audio_file = os.path.join(fixtures_dir, "hello.wav")
         all_lines = []
 
@@ -213,7 +163,7 @@ class TestSerialInjectionQueue:
         assert found, "First cycle did not reach Recording"
         all_lines.extend(lines)
 
-        time.sleep(1.5)
+        virtual_mic.wait_for_audio_consumed()
         portal_control.emit_deactivated()
 
         # Wait for the first cycle to complete before starting the second
@@ -229,7 +179,7 @@ class TestSerialInjectionQueue:
         assert found, "Second cycle did not reach Recording"
         all_lines.extend(lines)
 
-        time.sleep(1.5)
+        virtual_mic.wait_for_audio_consumed()
         portal_control.emit_deactivated()
 
         found_idle, lines = _wait_for_state(daemon_process, "Idle", timeout=60)
@@ -237,10 +187,7 @@ class TestSerialInjectionQueue:
         assert found_idle, "Second cycle did not return to Idle"
 
         # Count how many times we entered the Injecting state
-        injecting_count = sum(
-            1 for l in all_lines
-            if "STATE:" in l and l.split("STATE:")[-1].strip() == "Injecting"
-        )
+        injecting_count = _states_in(all_lines).count("Injecting")
 
         assert injecting_count >= 2, (
             f"Expected at least 2 injection cycles, got {injecting_count}: "
@@ -257,16 +204,10 @@ class TestRapidCycling:
         """Rapidly pressing and releasing the shortcut should not leave the daemon
         in a broken state or crash it.
         """
-        assert daemon_process.reached_idle, (
-            "Daemon did not reach Idle — mock portal setup incomplete"
-        )
-
-        # Rapid press/release cycles
-        for _ in range(5):
-            portal_control.emit_activated()
-            time.sleep(0.15)
-            portal_control.emit_deactivated()
-            time.sleep(0.15)
+        # Rapid press/release cycles, paced on the portal loop so the
+        # signals hit the bus at a steady 150 ms cadence independent of
+        # test-thread scheduling.
+        portal_control.emit_burst(5, interval=0.15)
 
         # Poll until daemon settles back to Idle
         found_idle, lines = _wait_for_state(daemon_process, "Idle", timeout=30)
@@ -277,11 +218,10 @@ class TestRapidCycling:
         )
 
         # Should end up back in Idle
-        state_lines = [l for l in lines if "STATE:" in l]
-        if state_lines:
-            final_state = state_lines[-1].split("STATE:")[-1].strip()
-            assert final_state == "Idle", (
-                f"Expected Idle after rapid cycling, got: {final_state}"
+        states = _states_in(lines)
+        if states:
+            assert states[-1] == "Idle", (
+                f"Expected Idle after rapid cycling, got: {states[-1]}"
             )
 
         # No unhandled errors
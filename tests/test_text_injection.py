@@ -6,12 +6,43 @@ import time
 
 import pytest
 
+from helpers.daemon_io import wait_for_state
 from helpers.mock_portal import keysyms_to_text
 
 
+# Upper bounds on event-driven waits, not unconditional sleeps.
 INJECTION_WAIT_SECONDS = 5
 TRANSCRIPTION_WAIT_SECONDS = 10
 
+_CYCLE_TIMEOUT = TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS
+
+
+def _wait_for_injection(daemon_process, portal_control, timeout=_CYCLE_TIMEOUT,
+                        quiet_seconds=0.3):
+    """Block until the dictation cycle's injected text has fully landed.
+
+    First waits for the daemon to log its return to Idle (the transcription
+    plus injection phases), then for the mock portal's keysym log to stop
+    growing for quiet_seconds, since the final keysym calls can still be in
+    flight on the bus when the state flips. Returns as soon as the cycle
+    actually completes instead of sleeping out the worst case; timeout is
+    the hard ceiling for each phase.
+    """
+    wait_for_state(daemon_process, "Idle", timeout=timeout)
+
+    deadline = time.monotonic() + timeout
+    last_len = -1
+    quiet_since = time.monotonic()
+    while time.monotonic() < deadline:
+        n = len(portal_control.get_keysym_log())
+        now = time.monotonic()
+        if n != last_len:
+            last_len = n
+            quiet_since = now
+        elif n > 0 and now - quiet_since >= quiet_seconds:
+            return
+        time.sleep(0.025)
+
 
 class TestTextInjection:
     """Tests for text injection accuracy using the RemoteDesktop portal.
@@ -24,15 +55,14 @@ class TestTextInjection:
         self, daemon_process, portal_control, virtual_mic, fixtures_dir
     ):
         """Simple ASCII text like 'Hello, world!' should be typed accurately."""
-        assert daemon_process.reached_idle
         wav_path = os.path.join(fixtures_dir, "hello_world.wav")
 
         portal_control.emit_activated()
         virtual_mic.stream_file(wav_path)
-        time.sleep(3)
+        virtual_mic.wait_for_audio_consumed()
         portal_control.emit_deactivated()
 
-        time.sleep(TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS)
+        _wait_for_injection(daemon_process, portal_control)
 
         captured = keysyms_to_text(portal_control.get_keysym_log())
 
@@ -45,15 +75,14 @@ class TestTextInjection:
         self, daemon_process, portal_control, virtual_mic, fixtures_dir
     ):
         """All characters from a known phrase should appear without drops."""
-        assert daemon_process.reached_idle
         wav_path = os.path.join(fixtures_dir, "the_quick_brown_fox.wav")
 
         portal_control.emit_activated()
         virtual_mic.stream_file(wav_path)
-        time.sleep(3)
+        virtual_mic.wait_for_audio_consumed()
         portal_control.emit_deactivated()
 
-        time.sleep(TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS)
+        _wait_for_injection(daemon_process, portal_control)
 
         captured = keysyms_to_text(portal_control.get_keysym_log())
 
@@ -68,23 +97,22 @@ class TestTextInjection:
         self, daemon_process, portal_control, virtual_mic, fixtures_dir
     ):
         """Two sequential dictations should produce non-interleaved text."""
-        assert daemon_process.reached_idle
         wav_a = os.path.join(fixtures_dir, "hello_world.wav")
         wav_b = os.path.join(fixtures_dir, "the_quick_brown_fox.wav")
 
         # First dictation
         portal_control.emit_activated()
         virtual_mic.stream_file(wav_a)
-        time.sleep(3)
+        virtual_mic.wait_for_audio_consumed()
         portal_control.emit_deactivated()
-        time.sleep(TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS)
+        _wait_for_injection(daemon_process, portal_control)
 
         # Second dictation
         portal_control.emit_activated()
         virtual_mic.stream_file(wav_b)
-        time.sleep(3)
+        virtual_mic.wait_for_audio_consumed()
         portal_control.emit_deactivated()
-        time.sleep(TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS)
+        _wait_for_injection(daemon_process, portal_control)
 
         captured = keysyms_to_text(portal_control.get_keysym_log())
 
@@ -102,15 +130,14 @@ class TestTextInjection:
         self, daemon_process, portal_control, virtual_mic, fixtures_dir
     ):
         """Punctuation characters (comma, period, exclamation) should be injected."""
-        assert daemon_process.reached_idle
         wav_path = os.path.join(fixtures_dir, "punctuation.wav")
 
         portal_control.emit_activated()
         virtual_mic.stream_file(wav_path)
-        time.sleep(3)
+        virtual_mic.wait_for_audio_consumed()
         portal_control.emit_deactivated()
 
-        time.sleep(TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS)
+        _wait_for_injection(daemon_process, portal_control)
 
         captured = keysyms_to_text(portal_control.get_keysym_log())
 
@@ -124,15 +151,14 @@ class TestTextInjection:
         self, daemon_process, portal_control, virtual_mic, fixtures_dir
     ):
         """Spaces between words should be preserved in the injected text."""
-        assert daemon_process.reached_idle
         wav_path = os.path.join(fixtures_dir, "hello_world.wav")
 
         portal_control.emit_activated()
         virtual_mic.stream_file(wav_path)
-        time.sleep(3)
+        virtual_mic.wait_for_audio_consumed()
         portal_control.emit_deactivated()
 
-        time.sleep(TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS)
+        _wait_for_injection(daemon_process, portal_control)
 
         captured = keysyms_to_text(portal_control.get_keysym_log())
 
@@ -145,7 +171,6 @@ class TestTextInjection:
         self, daemon_process, portal_control, virtual_mic, fixtures_dir
     ):
         """Longer text should be injected fully without truncation."""
-        assert daemon_process.reached_idle
         wav_path = os.path.join(fixtures_dir, "long_passage.wav")
 
         portal_control.emit_activated()
@@ -153,7 +178,7 @@ class TestTextInjection:
         time.sleep(5)
         portal_control.emit_deactivated()
 
-        time.sleep(TRANSCRIPTION_WAIT_SECONDS + INJECTION_WAIT_SECONDS)
+        _wait_for_injection(daemon_process, portal_control)
 
         captured = keysyms_to_text(portal_control.get_keysym_log())
 